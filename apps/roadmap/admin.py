@@ -1,5 +1,18 @@
 from django.contrib import admin
 from . import models
+from .catalog import bulk_catalog_edit
+
+
+class BulkDeleteMixin:
+	"""Deletes cascade through many rows; recount and invalidate once for all of them"""
+
+	def delete_model(self, request, obj):
+		with bulk_catalog_edit():
+			super().delete_model(request, obj)
+
+	def delete_queryset(self, request, queryset):
+		with bulk_catalog_edit():
+			super().delete_queryset(request, queryset)
 
 
 class TopicInline(admin.TabularInline):
@@ -13,33 +26,33 @@ class ProjectInline(admin.TabularInline):
 
 
 @admin.register(models.Category)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(BulkDeleteMixin, admin.ModelAdmin):
 	list_display = ('name', 'code', 'order')
 	ordering = ('order',)
 	inlines = []
 
 
 @admin.register(models.Phase)
-class PhaseAdmin(admin.ModelAdmin):
+class PhaseAdmin(BulkDeleteMixin, admin.ModelAdmin):
 	list_display = ('title', 'category', 'order')
 	list_filter = ('category',)
 	inlines = [TopicInline, ProjectInline]
 
 
 @admin.register(models.Topic)
-class TopicAdmin(admin.ModelAdmin):
+class TopicAdmin(BulkDeleteMixin, admin.ModelAdmin):
 	list_display = ('name', 'phase', 'order')
 	list_filter = ('phase__category',)
 
 
 @admin.register(models.Project)
-class ProjectAdmin(admin.ModelAdmin):
+class ProjectAdmin(BulkDeleteMixin, admin.ModelAdmin):
 	list_display = ('name', 'phase', 'order')
 	list_filter = ('phase__category',)
 
 
 @admin.register(models.Resource)
-class ResourceAdmin(admin.ModelAdmin):
+class ResourceAdmin(BulkDeleteMixin, admin.ModelAdmin):
 	list_display = ('title', 'resource_type')
 	filter_horizontal = ('phases',)
 
@@ -54,3 +67,9 @@ class TopicProgressAdmin(admin.ModelAdmin):
 class ProjectProgressAdmin(admin.ModelAdmin):
 	list_display = ('user', 'project', 'completed', 'completed_at')
 	list_filter = ('completed', 'user')
+
+
+@admin.register(models.PhaseProgressSummary)
+class PhaseProgressSummaryAdmin(admin.ModelAdmin):
+	list_display = ('user', 'phase', 'topics_done', 'projects_done')
+	list_filter = ('user',)
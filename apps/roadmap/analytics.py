@@ -0,0 +1,148 @@
+"""Cohort-wide progress analytics
+
+Every figure comes from a fixed number of grouped queries whose result
+size depends on the catalog (topics and phases), never on the number of
+users, so the report stays fast for large cohorts. Phase-level figures
+read the PhaseProgressSummary table kept by progress.py.
+"""
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import Count, Q
+
+from .cache import get_tree
+from .models import Topic, TopicProgress, PhaseProgressSummary
+
+# Seconds between the first and last completion of a user's topics in one phase
+_SPAN_SECONDS = {
+    'sqlite': '(julianday(MAX(tp.completed_at)) - julianday(MIN(tp.completed_at))) * 86400',
+    'postgresql': 'EXTRACT(EPOCH FROM MAX(tp.completed_at) - MIN(tp.completed_at))',
+    'mysql': 'TIMESTAMPDIFF(SECOND, MIN(tp.completed_at), MAX(tp.completed_at))',
+}
+
+_MEDIAN_SQL = """
+WITH spans AS (
+    SELECT t.phase_id AS phase_id, {span} AS seconds
+    FROM {progress} tp
+    INNER JOIN {topic} t ON t.id = tp.topic_id
+    WHERE tp.completed
+    GROUP BY t.phase_id, tp.user_id
+    HAVING COUNT(*) = (SELECT COUNT(*) FROM {topic} t2 WHERE t2.phase_id = t.phase_id)
+), ranked AS (
+    SELECT phase_id, seconds,
+           ROW_NUMBER() OVER (PARTITION BY phase_id ORDER BY seconds) AS pos,
+           COUNT(*) OVER (PARTITION BY phase_id) AS n
+    FROM spans
+)
+SELECT phase_id, AVG(seconds)
+FROM ranked
+WHERE pos IN ((n + 1) / 2, (n + 2) / 2)
+GROUP BY phase_id
+"""
+
+
+def learner_count():
+    """Users who have completed at least one topic or project"""
+    return (PhaseProgressSummary.objects
+            .filter(Q(topics_done__gt=0) | Q(projects_done__gt=0))
+            .values('user_id').distinct().count())
+
+
+def topic_completions():
+    """Map topic id -> number of users who completed it"""
+    return dict(
+        TopicProgress.objects.filter(completed=True)
+        .values_list('topic_id')
+        .annotate(done=Count('pk'))
+        .order_by()
+    )
+
+
+def phase_funnel():
+    """Map phase id -> ``{topics_done: users}`` for users who started the phase"""
+    histogram = defaultdict(dict)
+    rows = (PhaseProgressSummary.objects
+            .filter(Q(topics_done__gt=0) | Q(projects_done__gt=0))
+            .values_list('phase_id', 'topics_done')
+            .annotate(users=Count('pk'))
+            .order_by())
+    for phase_id, topics_done, users in rows:
+        histogram[phase_id][topics_done] = users
+    return histogram
+
+
+def median_completion_seconds():
+    """Map phase id -> median seconds from first to last topic completion
+
+    Only users who completed every topic of the phase count. The grouping,
+    ranking and median are done in one statement with window functions.
+    ``completed_at`` is refreshed on every save, so a topic that was
+    unticked and ticked again counts from its latest completion.
+    """
+    span = _SPAN_SECONDS.get(connection.vendor)
+    if span is None:
+        return {}
+    sql = _MEDIAN_SQL.format(
+        span=span,
+        progress=connection.ops.quote_name(TopicProgress._meta.db_table),
+        topic=connection.ops.quote_name(Topic._meta.db_table),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        return {phase_id: float(seconds) for phase_id, seconds in cursor.fetchall()}
+
+
+def _rate(part, whole):
+    return round(part / whole, 4) if whole else 0.0
+
+
+def cohort_report():
+    """Per-topic completion rates, per-phase funnel and median time-to-complete
+
+    Rates are relative to ``learners``, the users with any completed item.
+    A phase's ``drop_off`` is the share of users who started it but not the
+    next phase of the same category.
+    """
+    learners = learner_count()
+    completions = topic_completions()
+    funnel = phase_funnel()
+    medians = median_completion_seconds()
+
+    topics, phases = [], []
+    for category in get_tree():
+        category_phases = []
+        for phase in category.phases:
+            histogram = funnel.get(phase.id, {})
+            started = sum(histogram.values())
+            completed = sum(
+                users for done, users in histogram.items() if phase.topics and done >= len(phase.topics)
+            )
+            median = medians.get(phase.id)
+            category_phases.append({
+                'category': category.code,
+                'phase_id': phase.id,
+                'order': phase.order,
+                'title': phase.title,
+                'started': started,
+                'completed': completed,
+                'completion_rate': _rate(completed, started),
+                'median_days': round(median / 86400, 2) if median is not None else None,
+            })
+            for topic in phase.topics:
+                done = completions.get(topic.id, 0)
+                topics.append({
+                    'category': category.code,
+                    'phase': phase.order,
+                    'topic_id': topic.id,
+                    'name': topic.name,
+                    'completed': done,
+                    'rate': _rate(done, learners),
+                })
+        for current, following in zip(category_phases, category_phases[1:] + [None]):
+            if following is None:
+                current['drop_off'] = None
+            else:
+                current['drop_off'] = _rate(max(current['started'] - following['started'], 0),
+                                            current['started'])
+        phases.extend(category_phases)
+    return {'learners': learners, 'phases': phases, 'topics': topics}
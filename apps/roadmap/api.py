@@ -0,0 +1,104 @@
+"""Read-only JSON export of the catalog tree
+
+``iter_tree_json`` serializes the cached tree one category at a time, so a
+StreamingHttpResponse can send it without the whole document ever being
+built in memory. Clients pick the fields they need per type and which
+child collections to include, and may embed their own progress.
+"""
+import json
+
+from .cache import CategoryNode, PhaseNode, TopicNode, ProjectNode, ResourceNode
+
+CHILDREN = ('phases', 'topics', 'projects', 'resources')
+
+# Plain (non-nested) fields per type; progress adds ``completed`` to topics and projects
+FIELDS = {
+    'category': [name for name in CategoryNode._fields if name not in CHILDREN],
+    'phase': [name for name in PhaseNode._fields if name not in CHILDREN],
+    'topic': list(TopicNode._fields),
+    'project': list(ProjectNode._fields),
+    'resource': list(ResourceNode._fields),
+}
+PROGRESS_TYPES = ('topic', 'project')
+
+_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+
+def parse_fields(query, progress=False):
+    """Per-type field lists from ``fields[<type>]=a,b`` parameters in ``query``
+
+    Types without a parameter get every field. Raises ValueError for
+    unknown types or fields.
+    """
+    selected = {}
+    for key in query:
+        if not key.startswith('fields[') or not key.endswith(']'):
+            continue
+        kind = key[len('fields['):-1]
+        if kind not in FIELDS:
+            raise ValueError(f'unknown type {kind!r} in {key}')
+        names = [name for name in query[key].split(',') if name]
+        allowed = FIELDS[kind] + (['completed'] if progress and kind in PROGRESS_TYPES else [])
+        unknown = [name for name in names if name not in allowed]
+        if unknown:
+            raise ValueError(f'unknown {kind} field(s): {", ".join(unknown)}')
+        selected[kind] = names
+    for kind, names in FIELDS.items():
+        if kind not in selected:
+            selected[kind] = names + (['completed'] if progress and kind in PROGRESS_TYPES else [])
+    return selected
+
+
+def parse_include(value):
+    """The child collections named in ``include=phases,topics``; all of them by default
+
+    Topics, projects and resources need phases, which are added when missing.
+    """
+    if value is None:
+        return set(CHILDREN)
+    include = {name for name in value.split(',') if name}
+    unknown = include - set(CHILDREN)
+    if unknown:
+        raise ValueError(f'unknown collection(s): {", ".join(sorted(unknown))}')
+    if include - {'phases'}:
+        include.add('phases')
+    return include
+
+
+def _pick(node, names, completed=None):
+    data = {}
+    for name in names:
+        data[name] = (node.id in completed) if name == 'completed' else getattr(node, name)
+    return data
+
+
+def serialize_category(category, fields, include, progress=None):
+    """One category as a dict, limited to ``fields`` and ``include``
+
+    ``progress`` is ``{'topic': ids, 'project': ids}`` of completed items.
+    """
+    progress = progress or {}
+    data = _pick(category, fields['category'])
+    if 'phases' not in include:
+        return data
+    phases = []
+    for phase in category.phases:
+        entry = _pick(phase, fields['phase'])
+        if 'topics' in include:
+            entry['topics'] = [_pick(t, fields['topic'], progress.get('topic')) for t in phase.topics]
+        if 'projects' in include:
+            entry['projects'] = [_pick(p, fields['project'], progress.get('project')) for p in phase.projects]
+        if 'resources' in include:
+            entry['resources'] = [_pick(r, fields['resource']) for r in phase.resources]
+        phases.append(entry)
+    data['phases'] = phases
+    return data
+
+
+def iter_tree_json(categories, fields, include, progress=None):
+    """Yield ``{"categories": [...]}`` as JSON text, one category per chunk"""
+    yield '{"categories":['
+    for index, category in enumerate(categories):
+        prefix = ',' if index else ''
+        yield prefix + _encoder.encode(serialize_category(category, fields, include, progress))
+    yield ']}'
@@ -0,0 +1,310 @@
+"""Cached, immutable snapshot of the roadmap catalog
+
+The catalog (categories, phases, topics, projects and resources) only
+changes when an admin edits it, so it is read once, turned into nested
+named tuples and stored in Django's cache under a global version number.
+Signals in ``signals.py`` bump the version whenever a catalog row changes.
+
+Signed-in pages are additionally kept, fully rendered, in ``page_cache``
+keyed by the catalog version and a per-user progress version.
+
+The versions are only global if Django's default cache is shared by every
+worker process (Redis, Memcached, the file or database cache). With a
+per-process LocMemCache an edit made in one process is never seen by the
+others, so that setup is unsupported beyond a single process; the
+``roadmap.W001`` system check warns about it.
+
+Keys are namespaced by the primary database, so the test runner and the
+benchmark, which share the cache with the site but use databases of
+their own, never read or leave versions and trees for the real catalog.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from operator import attrgetter
+from typing import NamedTuple, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Prefetch
+
+from .models import Category, Phase, Topic, Project, Resource
+
+
+
+class TopicNode(NamedTuple):
+    id: int
+    name: str
+    order: int
+
+
+class ProjectNode(NamedTuple):
+    id: int
+    name: str
+    description: str
+    order: int
+
+
+class ResourceNode(NamedTuple):
+    id: int
+    title: str
+    resource_type: str
+    url: str
+    description: str
+
+
+class PhaseNode(NamedTuple):
+    id: int
+    category_id: int
+    title: str
+    week_range: str
+    goal: str
+    order: int
+    topics: Tuple[TopicNode, ...]
+    projects: Tuple[ProjectNode, ...]
+    resources: Tuple[ResourceNode, ...]
+
+
+class CategoryNode(NamedTuple):
+    id: int
+    name: str
+    code: str
+    description: str
+    order: int
+    phases: Tuple[PhaseNode, ...]
+
+
+_namespaces = {}
+
+
+def _key(name):
+    """Cache key ``name`` within the namespace of the primary database"""
+    settings_dict = connections[DEFAULT_DB_ALIAS].settings_dict
+    identity = tuple(str(settings_dict.get(part)) for part in ('ENGINE', 'HOST', 'PORT', 'NAME'))
+    namespace = _namespaces.get(identity)
+    if namespace is None:
+        digest = hashlib.sha1('\0'.join(identity).encode()).hexdigest()[:12]
+        namespace = _namespaces[identity] = f'roadmap:{digest}'
+    return f'{namespace}:{name}'
+
+
+def _initial_version():
+    # Seed from the clock so an evicted version is never reused and, read as
+    # a modification time, is never earlier than the real last change
+    return time.time_ns()
+
+
+def get_catalog_version():
+    key = _key('catalog_version')
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key):
+    # Versions are nanosecond timestamps of the latest change (kept strictly
+    # increasing), so they double as Last-Modified times
+    version = max(time.time_ns(), (cache.get(key) or 0) + 1)
+    cache.set(key, version, None)
+    return version
+
+
+def bump_catalog_version():
+    return _bump_version(_key('catalog_version'))
+
+
+def _catalog_queryset():
+    # Always the primary: the tree is cached under the current version until
+    # the next edit, so a lagging replica would pin a stale tree there
+    db = DEFAULT_DB_ALIAS
+    # Leading with the parent id lets the (parent, order) indexes return the
+    # rows of an IN (...) prefetch already sorted; resources are few per
+    # phase and sorted in _to_nodes
+    return Category.objects.using(db).order_by('order', 'pk').prefetch_related(
+        Prefetch('phases', queryset=Phase.objects.using(db).order_by('category_id', 'order', 'pk')),
+        Prefetch('phases__topics', queryset=Topic.objects.using(db).order_by('phase_id', 'order', 'pk')),
+        Prefetch('phases__projects', queryset=Project.objects.using(db).order_by('phase_id', 'order', 'pk')),
+        Prefetch('phases__resources', queryset=Resource.objects.using(db).order_by()),
+    )
+
+
+def _to_nodes(categories):
+    return tuple(
+        CategoryNode(
+            id=category.id,
+            name=category.name,
+            code=category.code,
+            description=category.description,
+            order=category.order,
+            phases=tuple(
+                PhaseNode(
+                    id=phase.id,
+                    category_id=category.id,
+                    title=phase.title,
+                    week_range=phase.week_range,
+                    goal=phase.goal,
+                    order=phase.order,
+                    topics=tuple(TopicNode(t.id, t.name, t.order) for t in phase.topics.all()),
+                    projects=tuple(
+                        ProjectNode(p.id, p.name, p.description, p.order) for p in phase.projects.all()
+                    ),
+                    resources=tuple(
+                        ResourceNode(r.id, r.title, r.resource_type, r.url, r.description)
+                        for r in sorted(phase.resources.all(), key=attrgetter('pk'))
+                    ),
+                )
+                for phase in category.phases.all()
+            ),
+        )
+        for category in categories
+    )
+
+
+def build_tree():
+    """Read the whole catalog from the database into nested named tuples"""
+    return _to_nodes(_catalog_queryset())
+
+
+async def abuild_tree():
+    # async iteration runs the query and its prefetches in one worker thread
+    return _to_nodes([category async for category in _catalog_queryset()])
+
+
+_local = (None, None)
+
+
+def get_tree():
+    """Return the catalog tree for the current catalog version
+
+    The tree is shared through Django's cache and memoised per process, so
+    repeated calls with an unchanged catalog issue no database queries.
+    """
+    global _local
+    version = get_catalog_version()
+    if _local[0] == version:
+        return _local[1]
+    key = _key(f'tree:{version}')
+    tree = cache.get(key)
+    if tree is None:
+        tree = build_tree()
+        cache.set(key, tree, None)
+    _local = (version, tree)
+    return tree
+
+
+async def aget_tree():
+    """Async get_tree() for ASGI views"""
+    global _local
+    version = await cache.aget(_key('catalog_version'))
+    if version is None:
+        version = await sync_to_async(get_catalog_version)()
+    if _local[0] == version:
+        return _local[1]
+    key = _key(f'tree:{version}')
+    tree = await cache.aget(key)
+    if tree is None:
+        tree = await abuild_tree()
+        await cache.aset(key, tree, None)
+    _local = (version, tree)
+    return tree
+
+
+def _progress_version_key(user_id):
+    return _key(f'progress_version:{user_id}')
+
+
+def get_progress_version(user_id):
+    key = _progress_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_progress_version(user_id):
+    return _bump_version(_progress_version_key(user_id))
+
+
+class PageCache:
+    """In-process LRU of rendered roadmap pages, one entry per user
+
+    Each entry remembers the ``(catalog_version, progress_version, ...)``
+    key it was rendered for; a lookup with any other key is a miss. The
+    total size of cached pages is capped at ``max_bytes``, evicting the
+    least recently used users first.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, key):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != key:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, user_id, key, content):
+        with self._lock:
+            self._discard(user_id)
+            if len(content) > self.max_bytes:
+                return
+            self._entries[user_id] = (key, content)
+            self.size += len(content)
+            while self.size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def _discard(self, user_id):
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """Size and hit counters, exported by ``metrics.render_metrics``"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+page_cache = PageCache(getattr(settings, 'ROADMAP_PAGE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+
+def page_cache_key(request):
+    """Version key for the signed-in user's rendered roadmap page
+
+    The CSRF secret is part of the key so a cached form always carries a
+    token that is valid for the requesting browser. Returns None when the
+    request has no CSRF cookie yet and the page should not be cached.
+    """
+    csrf_secret = request.META.get('CSRF_COOKIE')
+    if not csrf_secret:
+        return None
+    return (get_catalog_version(), get_progress_version(request.user.pk), csrf_secret)
@@ -0,0 +1,243 @@
+"""Diff-based loading of roadmap definitions into the catalog tables
+
+Rows are matched by natural keys (category code, phase order within its
+category, topic/project order within its phase). Only rows that differ
+are inserted, updated or deleted, so re-running a load on an unchanged
+catalog is a handful of SELECTs and never touches user progress.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+
+from .cache import bump_catalog_version, bump_progress_version
+from .models import Category, Phase, Topic, Project
+from .progress import recount_phase_summaries
+from .search import rebuild_index
+
+CATEGORY_FIELDS = ['name', 'description', 'order']
+PHASE_FIELDS = ['title', 'week_range', 'goal']
+TOPIC_FIELDS = ['name']
+PROJECT_FIELDS = ['name', 'description']
+
+
+STAT_MODELS = ('categories', 'phases', 'topics', 'projects')
+
+
+class BulkCatalogEdit:
+    """Work the per-row receivers left for the end of a bulk catalog edit"""
+
+    def __init__(self):
+        # Phases that lost topics or projects, with their progress rows
+        self.phase_ids = set()
+        # Users whose progress rows were deleted by a cascade
+        self.user_ids = set()
+        # Whether catalog text changed and the search index needs a rebuild
+        self.reindex = False
+
+
+_bulk_edit = ContextVar('roadmap_bulk_catalog_edit', default=None)
+
+
+def current_bulk_edit():
+    """The BulkCatalogEdit running in this context, or None"""
+    return _bulk_edit.get()
+
+
+@contextmanager
+def bulk_catalog_edit():
+    """Run bulk catalog writes in one transaction and invalidate once at the end
+
+    bulk_create and bulk_update send no signals, and cascading deletes send
+    one per row, which the receivers in ``signals.py`` would each answer
+    with queries of their own. Inside this block those receivers only note
+    what changed; on the way out the search index is rebuilt and the
+    affected phase summaries recounted once, and the cached tree and
+    progress pages are invalidated on commit. Set ``reindex`` on the
+    yielded edit after bulk writes that change catalog text. Nested blocks
+    join the outermost one.
+    """
+    edit = _bulk_edit.get()
+    if edit is not None:
+        yield edit
+        return
+    edit = BulkCatalogEdit()
+    token = _bulk_edit.set(edit)
+    try:
+        with transaction.atomic():
+            yield edit
+            if edit.reindex:
+                rebuild_index()
+            recount_phase_summaries(edit.phase_ids, create=False)
+            transaction.on_commit(bump_catalog_version)
+            for user_id in edit.user_ids:
+                transaction.on_commit(lambda user_id=user_id: bump_progress_version(user_id))
+    finally:
+        _bulk_edit.reset(token)
+
+
+def empty_stats():
+    return {name: {'created': 0, 'updated': 0, 'deleted': 0} for name in STAT_MODELS}
+
+
+def has_changes(stats):
+    """Whether ``stats`` records any created, updated or deleted row"""
+    return any(any(stats[name].values()) for name in STAT_MODELS)
+
+
+def sync_rows(model, existing, wanted, fields, stats, prune=True):
+    """Make ``existing`` match ``wanted``; both map natural keys to instances
+
+    Returns natural key -> saved instance for every wanted row.
+    """
+    to_create = [obj for key, obj in wanted.items() if key not in existing]
+    to_update = []
+    for key, obj in wanted.items():
+        current = existing.get(key)
+        if current is None:
+            continue
+        changed = [f for f in fields if getattr(current, f) != getattr(obj, f)]
+        if changed:
+            for f in fields:
+                setattr(current, f, getattr(obj, f))
+            to_update.append(current)
+    stale = [obj.pk for key, obj in existing.items() if key not in wanted] if prune else []
+
+    if to_create:
+        model.objects.bulk_create(to_create)
+    if to_update:
+        model.objects.bulk_update(to_update, fields)
+    if stale:
+        model.objects.filter(pk__in=stale).delete()
+    stats['created'] += len(to_create)
+    stats['updated'] += len(to_update)
+    stats['deleted'] += len(stale)
+
+    saved = dict(existing)
+    for key in stale:
+        saved.pop(key, None)
+    saved.update((key, obj) for key, obj in wanted.items() if key not in existing)
+    return saved
+
+
+def _phase_number(phase_data, index):
+    return phase_data.get('order', index)
+
+
+def sync_phases(phase_records, stats, prune=True):
+    """Sync a batch of ``(category, order, phase_data)`` records
+
+    Topics and projects of every phase in the batch are synced too. Existing
+    rows for the batch are read with one query per model.
+    """
+    phase_records = list(phase_records)
+    if not phase_records:
+        return {}
+    category_ids = {category.pk for category, _, _ in phase_records}
+    orders = {order for _, order, _ in phase_records}
+    existing = {
+        (phase.category_id, phase.order): phase
+        for phase in Phase.objects.filter(category_id__in=category_ids, order__in=orders)
+    }
+    wanted = {
+        (category.pk, order): Phase(
+            category=category,
+            title=data['title'],
+            week_range=data.get('week_range', ''),
+            goal=data.get('goal', ''),
+            order=order,
+        )
+        for category, order, data in phase_records
+    }
+    # Only phases named in this batch are candidates for update; pruning of
+    # whole phases is handled by the caller, which sees every record.
+    existing = {key: phase for key, phase in existing.items() if key in wanted}
+    phases = sync_rows(Phase, existing, wanted, PHASE_FIELDS, stats['phases'], prune=False)
+
+    phase_ids = [phase.pk for phase in phases.values()]
+    by_key = {(category.pk, order): data for category, order, data in phase_records}
+
+    existing_topics = {
+        (topic.phase_id, topic.order): topic
+        for topic in Topic.objects.filter(phase_id__in=phase_ids)
+    }
+    wanted_topics = {}
+    for key, data in by_key.items():
+        phase = phases[key]
+        for order, name in enumerate(data.get('topics', []), 1):
+            wanted_topics[(phase.pk, order)] = Topic(phase=phase, name=name, order=order)
+    sync_rows(Topic, existing_topics, wanted_topics, TOPIC_FIELDS, stats['topics'], prune)
+
+    existing_projects = {
+        (project.phase_id, project.order): project
+        for project in Project.objects.filter(phase_id__in=phase_ids)
+    }
+    wanted_projects = {}
+    for key, data in by_key.items():
+        phase = phases[key]
+        for order, project in enumerate(data.get('projects', []), 1):
+            wanted_projects[(phase.pk, order)] = Project(
+                phase=phase,
+                name=project['name'],
+                description=project.get('description', ''),
+                order=order,
+            )
+    sync_rows(Project, existing_projects, wanted_projects, PROJECT_FIELDS, stats['projects'], prune)
+    return phases
+
+
+def sync_categories(category_records, stats, prune=False):
+    """Sync category rows (without their phases); returns code -> Category
+
+    Every existing category is returned; with ``prune`` those missing from
+    ``category_records`` are deleted instead.
+    """
+    existing = {category.code: category for category in Category.objects.all()}
+    wanted = {
+        data['code']: Category(
+            code=data['code'],
+            name=data['name'],
+            description=data.get('description', ''),
+            order=data.get('order', index),
+        )
+        for index, data in enumerate(category_records, 1)
+    }
+    return sync_rows(Category, existing, wanted, CATEGORY_FIELDS, stats['categories'], prune)
+
+
+def prune_phases(categories, seen_keys, stats):
+    """Delete phases of ``categories`` whose (category_id, order) was not loaded"""
+    stale = [
+        pk for pk, category_id, order in
+        Phase.objects.filter(category__in=categories).values_list('pk', 'category_id', 'order')
+        if (category_id, order) not in seen_keys
+    ]
+    if stale:
+        Phase.objects.filter(pk__in=stale).delete()
+    stats['phases']['deleted'] += len(stale)
+
+
+def sync_catalog(definitions, prune=True):
+    """Make the catalog match ``definitions`` in one transaction
+
+    ``definitions`` is a list of category dicts, each with a ``phases`` list
+    of ``{title, week_range, goal, topics: [names], projects: [{name,
+    description}]}``. With ``prune`` phases, topics and projects of the given
+    categories that are missing from the definitions are deleted; categories
+    that are not listed at all are left alone. Returns created/updated/deleted
+    counts per model.
+    """
+    stats = empty_stats()
+    with bulk_catalog_edit() as edit:
+        categories = sync_categories(definitions, stats, prune=False)
+        records = [
+            (categories[data['code']], _phase_number(phase_data, index), phase_data)
+            for data in definitions
+            for index, phase_data in enumerate(data.get('phases', []), 1)
+        ]
+        sync_phases(records, stats, prune)
+        if prune:
+            seen = {(category.pk, order) for category, order, _ in records}
+            prune_phases(categories.values(), seen, stats)
+        edit.reindex |= has_changes(stats)
+    return stats
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Backends whose entries are private to one process (or not kept at all)
+UNSHARED_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """The catalog and progress versions need a cache shared by every process"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend in UNSHARED_CACHES:
+        return [Warning(
+            f'The default cache ({backend}) is not shared between processes.',
+            hint='Catalog and progress changes made in one worker will not reach the '
+                 'others; set CACHE_URL to a shared cache such as Redis or a file cache.',
+            id='roadmap.W001',
+        )]
+    return []
@@ -1,8 +1,53 @@
 from django import forms
-from django.forms import ModelForm
+from django.core.exceptions import ValidationError
+from django.forms import ModelForm, BaseModelFormSet
 from .models import TopicProgress, Topic
 
 
+class TopicLookup(dict):
+    """Topics keyed by id, fetched once and shared by every form in a formset"""
+
+    def __init__(self, queryset, topics=None):
+        self.queryset = queryset
+        super().__init__((topic.id, topic) for topic in (queryset if topics is None else topics))
+
+    @classmethod
+    def from_tree(cls, tree):
+        """Build the lookup from the cached catalog tree without querying"""
+        topics = (
+            Topic(id=topic.id, name=topic.name, order=topic.order, phase_id=phase.id)
+            for category in tree
+            for phase in category.phases
+            for topic in phase.topics
+        )
+        return cls(Topic.objects.all(), topics)
+
+
+class LookupChoiceField(forms.ModelChoiceField):
+    """ModelChoiceField that resolves submitted ids without querying the database"""
+
+    def __init__(self, queryset, resolve, **kwargs):
+        super().__init__(queryset, **kwargs)
+        self.resolve = resolve
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, self.queryset.model):
+            return value
+        try:
+            obj = self.resolve(int(value))
+        except (TypeError, ValueError):
+            obj = None
+        if obj is None:
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+        return obj
+
+
 class TopicProgressForm(ModelForm):
     class Meta:
         model = TopicProgress
@@ -12,17 +57,64 @@ class TopicProgressForm(ModelForm):
             'completed': forms.CheckboxInput(attrs={'class': 'topic-checkbox-input'})
         }
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, topic_lookup=None, **kwargs):
         super().__init__(*args, **kwargs)
+        self.topic_lookup = topic_lookup
+        if topic_lookup is not None:
+            field = self.fields['topic']
+            self.fields['topic'] = LookupChoiceField(
+                topic_lookup.queryset, topic_lookup.get,
+                widget=field.widget, required=field.required,
+            )
         # Show topic name next to the checkbox in template via form.topic_name
         topic_obj = None
-        if self.instance and getattr(self.instance, 'topic', None):
-            topic_obj = self.instance.topic
+        if self.instance and getattr(self.instance, 'topic_id', None):
+            if topic_lookup is not None:
+                topic_obj = topic_lookup.get(self.instance.topic_id)
+            if topic_obj is None:
+                topic_obj = self.instance.topic
         else:
             topic_id = self.initial.get('topic')
             if topic_id:
-                try:
-                    topic_obj = Topic.objects.get(pk=topic_id)
-                except Topic.DoesNotExist:
-                    topic_obj = None
+                if topic_lookup is not None:
+                    topic_obj = topic_lookup.get(int(topic_id))
+                else:
+                    try:
+                        topic_obj = Topic.objects.get(pk=topic_id)
+                    except Topic.DoesNotExist:
+                        topic_obj = None
         self.topic_name = topic_obj.name if topic_obj else ''
+
+    def _get_validation_exclusions(self):
+        exclude = super()._get_validation_exclusions()
+        if self.topic_lookup is not None:
+            # The lookup already proved the topic exists; model validation
+            # would otherwise re-check it with one query per form
+            exclude.add('topic')
+        return exclude
+
+
+class BaseTopicProgressFormSet(BaseModelFormSet):
+    """Formset whose forms share one prefetched TopicLookup
+
+    Both the hidden ``topic`` field and the formset's own ``id`` field are
+    resolved from memory, so building and validating the formset costs a
+    constant number of queries regardless of the number of topics.
+    """
+
+    def __init__(self, *args, topic_lookup=None, **kwargs):
+        if topic_lookup is not None:
+            kwargs['form_kwargs'] = {**kwargs.get('form_kwargs', {}), 'topic_lookup': topic_lookup}
+        self.topic_lookup = topic_lookup
+        super().__init__(*args, **kwargs)
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        if self.topic_lookup is None:
+            return
+        pk_name = self.model._meta.pk.name
+        field = form.fields[pk_name]
+        form.fields[pk_name] = LookupChoiceField(
+            field.queryset, self._existing_object,
+            initial=field.initial, required=False, widget=field.widget,
+        )
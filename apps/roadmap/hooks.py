@@ -0,0 +1,38 @@
+"""Query hooks that follow a request through sync and async code
+
+``connection.execute_wrapper`` wraps one connection object, but under ASGI
+the ORM runs in worker threads that hold connection objects of their own.
+Instead every connection gets one permanent wrapper, ``dispatch``, when it
+opens (see ``signals.py``); it passes each query through the hooks set for
+the current context. Context variables are copied into ``sync_to_async``
+threads, so hooks set around an awaited response see its queries too.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+_hooks = ContextVar('roadmap_query_hooks', default=())
+
+
+def dispatch(execute, sql, params, many, context):
+    """Execute wrapper running the query through the current context's hooks"""
+    # The first hook set is the outermost, as with execute_wrapper
+    for hook in reversed(_hooks.get()):
+        execute = partial(hook, execute)
+    return execute(sql, params, many, context)
+
+
+def install(connection):
+    if dispatch not in connection.execute_wrappers:
+        # First in line: execute_wrapper() removes the last wrapper on exit
+        connection.execute_wrappers.insert(0, dispatch)
+
+
+@contextmanager
+def query_hook(hook):
+    """Pass every query run in this context through ``hook``, an execute wrapper"""
+    token = _hooks.set((*_hooks.get(), hook))
+    try:
+        yield hook
+    finally:
+        _hooks.reset(token)
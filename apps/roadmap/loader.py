@@ -0,0 +1,143 @@
+"""Streaming loader for roadmap definition files
+
+A definition file is either JSON Lines (``.jsonl``, one record per line) or
+a JSON array of records (``.json``). Two kinds of record are understood::
+
+    {"code": "AI", "name": "Full-Stack AI Engineer Path", "description": "...", "order": 1}
+    {"category": "AI", "order": 1, "title": "...", "week_range": "...", "goal": "...",
+     "topics": ["..."], "projects": [{"name": "...", "description": "..."}]}
+
+A category record must come before the phases that reference it unless the
+category already exists. Files are parsed one record at a time and phases
+are written in fixed-size batches through ``catalog.sync_phases``, so memory
+use does not depend on the size of the file.
+"""
+import json
+import re
+from pathlib import Path
+
+from .catalog import CATEGORY_FIELDS, bulk_catalog_edit, empty_stats, has_changes, prune_phases, sync_phases, sync_rows
+from .models import Category
+
+CHUNK_SIZE = 64 * 1024
+_WHITESPACE = re.compile(r'\s*')
+_SEPARATORS = re.compile(r'[\s,]*')
+
+
+def iter_json_array(fh, chunk_size=CHUNK_SIZE):
+    """Yield the elements of a top-level JSON array without reading it whole"""
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+
+    def skip(pattern):
+        # Advance past ``pattern``, reading more input if it reaches the end
+        nonlocal buffer, pos, eof
+        while True:
+            pos = pattern.match(buffer, pos).end()
+            if pos < len(buffer) or eof:
+                return
+            chunk = fh.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+
+    skip(_WHITESPACE)
+    if buffer[pos:pos + 1] != '[':
+        raise ValueError('expected a JSON array of records')
+    pos += 1
+    while True:
+        skip(_SEPARATORS)
+        if pos >= len(buffer):
+            raise ValueError('unterminated JSON array')
+        if buffer[pos] == ']':
+            return
+        try:
+            record, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # The element spans the chunk boundary; read more and retry
+            chunk = fh.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        yield record
+
+
+def iter_records(path):
+    """Yield records from a ``.json`` or ``.jsonl`` definition file"""
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8') as fh:
+        if path.suffix == '.jsonl':
+            for line_number, line in enumerate(fh, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as exc:
+                    raise ValueError(f'{path}:{line_number}: {exc}') from exc
+        else:
+            yield from iter_json_array(fh)
+
+
+def _sync_category(record, categories, stats):
+    existing = {record['code']: categories[record['code']]} if record['code'] in categories else {}
+    wanted = {
+        record['code']: Category(
+            code=record['code'],
+            name=record['name'],
+            description=record.get('description', ''),
+            order=record.get('order', 0),
+        )
+    }
+    categories.update(sync_rows(Category, existing, wanted, CATEGORY_FIELDS, stats['categories']))
+
+
+def load_definitions(paths, batch_size=500, prune=False, progress=None):
+    """Stream records from ``paths`` into the catalog in one transaction
+
+    Phases are synced ``batch_size`` at a time. With ``prune`` phases of the
+    loaded categories that no file mentions are deleted afterwards.
+    ``progress`` is called with the running stats after every batch.
+    Returns created/updated/deleted counts per model plus ``rows``, the
+    number of phase, topic and project rows read.
+    """
+    stats = empty_stats()
+    stats['rows'] = 0
+    seen = set()
+    loaded_categories = {}
+
+    with bulk_catalog_edit() as edit:
+        categories = {category.code: category for category in Category.objects.all()}
+        batch = []
+
+        def flush():
+            sync_phases(batch, stats)
+            batch.clear()
+            if progress:
+                progress(stats)
+
+        for path in paths:
+            for record in iter_records(path):
+                if 'category' not in record:
+                    _sync_category(record, categories, stats)
+                    continue
+                category = categories.get(record['category'])
+                if category is None:
+                    raise ValueError(f"{path}: unknown category {record['category']!r}")
+                key = (category.pk, record['order'])
+                if key in seen:
+                    raise ValueError(f"{path}: duplicate phase {record['category']} #{record['order']}")
+                seen.add(key)
+                loaded_categories[category.pk] = category
+                batch.append((category, record['order'], record))
+                stats['rows'] += 1 + len(record.get('topics', [])) + len(record.get('projects', []))
+                if len(batch) >= batch_size:
+                    flush()
+        if batch:
+            flush()
+
+        if prune:
+            prune_phases(loaded_categories.values(), seen, stats)
+        edit.reindex |= has_changes(stats)
+    return stats
@@ -0,0 +1,95 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.roadmap import views
+from apps.roadmap.cache import build_tree
+
+
+def roadmap_view_queries(user):
+    """Return the SQL the roadmap pages run for ``user``, captured from the views
+
+    The catalog tree is built once directly, as get_tree does on a cache miss;
+    then the phase index, the ?all=1 page and one phase fragment are rendered
+    through roadmap_view and phase_view. The requests carry no CSRF cookie,
+    so the page cache is bypassed and every progress query runs.
+    """
+    factory = RequestFactory()
+
+    def get(view, path, data=None, **kwargs):
+        request = factory.get(path, data)
+        request.user = user
+        return view(request, **kwargs)
+
+    with CaptureQueriesContext(connection) as ctx:
+        tree = build_tree()
+        url = reverse('roadmap:roadmap')
+        get(views.roadmap_view, url)
+        get(views.roadmap_view, url, {'all': '1'})
+        phase = next((phase for category in tree for phase in category.phases), None)
+        if phase is not None:
+            get(views.phase_view, reverse('roadmap:phase', args=[phase.id]), phase_id=phase.id)
+
+    statements = []
+    for query in ctx.captured_queries:
+        sql = query['sql']
+        if sql.lstrip().upper().startswith('SELECT') and sql not in statements:
+            statements.append(sql)
+    return statements
+
+
+def full_scans(plan_rows):
+    """SQLite plan lines that read a whole table instead of an index"""
+    return [
+        detail for detail in plan_rows
+        if detail.startswith('SCAN') and 'USING' not in detail
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Print EXPLAIN QUERY PLAN for the queries roadmap_view issues and flag full-table scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username whose progress queries are explained')
+        parser.add_argument(
+            '--fail-on-scan', action='store_true',
+            help='Exit with an error if any query still scans a whole table',
+        )
+
+    def handle(self, *args, **options):
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"Unknown user {options['user']!r}")
+        else:
+            # An unsaved user still produces the same query shapes
+            user = User.objects.order_by('pk').first() or User(pk=0)
+
+        sqlite = connection.vendor == 'sqlite'
+        prefix = 'EXPLAIN QUERY PLAN ' if sqlite else 'EXPLAIN '
+        scans = 0
+        with connection.cursor() as cursor:
+            for sql in roadmap_view_queries(user):
+                cursor.execute(prefix + sql)
+                # SQLite rows are (id, parent, notused, detail); others put the plan in column 0
+                plan = [row[-1] if sqlite else row[0] for row in cursor.fetchall()]
+                self.stdout.write(self.style.SQL_KEYWORD(sql))
+                for line in plan:
+                    self.stdout.write(f'    {line}')
+                if sqlite:
+                    for detail in full_scans(plan):
+                        scans += 1
+                        self.stdout.write(self.style.WARNING(f'    full-table scan: {detail}'))
+                self.stdout.write('')
+
+        if scans:
+            message = f'{scans} full-table scan(s) found'
+            if options['fail_on_scan']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        elif sqlite:
+            self.stdout.write(self.style.SUCCESS('No full-table scans'))
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.roadmap.synthetic import DEFAULT_PREFIX, clear_synthetic, generate_catalog
+
+
+class Command(BaseCommand):
+    help = 'Generate a synthetic catalog and users with random progress for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=2)
+        parser.add_argument('--phases', type=int, default=5, help='Phases per category')
+        parser.add_argument('--topics', type=int, default=20, help='Topics per phase')
+        parser.add_argument('--projects', type=int, default=3, help='Projects per phase')
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--progress', type=float, default=0.3,
+                            help='Chance that a user completed any given topic or project')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default=DEFAULT_PREFIX,
+                            help='Category code / username prefix marking synthetic rows')
+        parser.add_argument('--clear', action='store_true',
+                            help='Only delete previously generated rows with this prefix')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if not prefix or len(prefix) + len(str(options['categories'])) > 10:
+            raise CommandError('--prefix must be non-empty and leave room for the category number')
+        if not 0 <= options['progress'] <= 1:
+            raise CommandError('--progress must be between 0 and 1')
+
+        if options['clear']:
+            clear_synthetic(prefix)
+            self.stdout.write(self.style.SUCCESS(f'Removed synthetic data with prefix {prefix!r}'))
+            return
+
+        started = time.perf_counter()
+        counts = generate_catalog(
+            categories=options['categories'],
+            phases=options['phases'],
+            topics=options['topics'],
+            projects=options['projects'],
+            users=options['users'],
+            progress=options['progress'],
+            seed=options['seed'],
+            prefix=prefix,
+        )
+        elapsed = time.perf_counter() - started
+        for model, count in counts.items():
+            self.stdout.write(f'{model}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Generated synthetic data in {elapsed:.2f}s'))
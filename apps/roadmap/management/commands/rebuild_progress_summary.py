@@ -0,0 +1,24 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.roadmap.progress import rebuild_phase_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-phase progress summaries from the topic and project progress tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='users', metavar='USERNAME',
+                            help='Only rebuild this user (may be repeated)')
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['users']:
+            found = dict(User.objects.filter(username__in=options['users']).values_list('username', 'pk'))
+            unknown = sorted(set(options['users']) - set(found))
+            if unknown:
+                raise CommandError(f'Unknown user(s): {", ".join(unknown)}')
+            user_ids = list(found.values())
+
+        written = rebuild_phase_summaries(user_ids)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} phase summaries'))
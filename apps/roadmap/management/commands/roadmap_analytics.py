@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from apps.roadmap.analytics import cohort_report
+
+
+class Command(BaseCommand):
+    help = 'Report per-topic completion rates, per-phase drop-off and median time-to-complete'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Print the full report as JSON')
+        parser.add_argument('--topics', type=int, default=10,
+                            help='Number of least-completed topics to list (default: 10)')
+
+    def handle(self, *args, **options):
+        report = cohort_report()
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"Learners: {report['learners']}")
+        self.stdout.write('')
+        self.stdout.write(f"{'phase':40} {'started':>8} {'done':>8} {'rate':>6} {'drop':>6} {'median d':>9}")
+        for phase in report['phases']:
+            label = f"{phase['category']} {phase['order']} {phase['title']}"[:40]
+            drop = '-' if phase['drop_off'] is None else f"{phase['drop_off']:.0%}"
+            median = '-' if phase['median_days'] is None else phase['median_days']
+            self.stdout.write(
+                f"{label:40} {phase['started']:>8} {phase['completed']:>8} "
+                f"{phase['completion_rate']:>6.0%} {drop:>6} {median:>9}"
+            )
+
+        if options['topics']:
+            self.stdout.write('')
+            self.stdout.write(f"Least-completed topics (of {len(report['topics'])}):")
+            for topic in sorted(report['topics'], key=lambda t: (t['rate'], t['topic_id']))[:options['topics']]:
+                self.stdout.write(f"  {topic['rate']:>6.0%}  {topic['category']} {topic['phase']}  {topic['name']}")
@@ -0,0 +1,262 @@
+"""Per-view request metrics exposed in the Prometheus text format
+
+MetricsMiddleware records, for each resolved view, the wall time, the
+number and total time of SQL queries and the time spent in named stages
+(``stage('template')`` etc.) as histograms. Each process keeps its own
+registry, so scrape every worker (or run one) to see the full picture.
+The process's page cache counters are exported alongside.
+
+Set ``ROADMAP_METRICS_SAMPLE_RATE`` below 1 to time only that share of
+requests; unsampled requests only increment ``roadmap_requests_total``.
+"""
+import random
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .cache import page_cache
+from .hooks import query_hook
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}')
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram; one series per combination of label values"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=TIME_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                # Per-bucket counts (plus +Inf), then sum and count
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((labelvalues, list(values)) for labelvalues, values in self._series.items())
+        for labelvalues, values in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), values):
+                cumulative += count
+                le = bound if bound == '+Inf' else _number(float(bound))
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, labelvalues, [("le", le)])} {cumulative}')
+            labels = _labels(self.labelnames, labelvalues)
+            lines.append(f'{self.name}_sum{labels} {_number(float(values[-2]))}')
+            lines.append(f'{self.name}_count{labels} {values[-1]}')
+        return lines
+
+
+REQUESTS = Counter('roadmap_requests_total', 'Requests handled, sampled or not', ['view'])
+REQUEST_SECONDS = Histogram('roadmap_request_duration_seconds', 'Wall time per request', ['view'])
+SQL_QUERIES = Histogram('roadmap_request_sql_queries', 'SQL queries per request', ['view'],
+                        buckets=COUNT_BUCKETS)
+SQL_SECONDS = Histogram('roadmap_request_sql_duration_seconds', 'Time spent in SQL per request', ['view'])
+STAGE_SECONDS = Histogram('roadmap_request_stage_duration_seconds',
+                          'Time spent in named stages such as template rendering', ['view', 'stage'])
+METRICS = [REQUESTS, REQUEST_SECONDS, SQL_QUERIES, SQL_SECONDS, STAGE_SECONDS]
+
+_current = ContextVar('roadmap_request_sample', default=None)
+
+
+class _Sample:
+    __slots__ = ('queries', 'sql_seconds', 'stages', 'elapsed')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.stages = {}
+        self.elapsed = 0.0
+
+    @contextmanager
+    def timing(self):
+        """Time the block and the queries and stages run in it"""
+        token = _current.set(self)
+        start = perf_counter()
+        try:
+            with query_hook(self):
+                yield self
+        finally:
+            self.elapsed = perf_counter() - start
+            _current.reset(token)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_seconds += perf_counter() - start
+            self.queries += 1
+
+
+@contextmanager
+def stage(name):
+    """Time a block as stage ``name`` of the current sampled request"""
+    sample = _current.get()
+    if sample is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        sample.stages[name] = sample.stages.get(name, 0.0) + perf_counter() - start
+
+
+def sample_rate():
+    return getattr(settings, 'ROADMAP_METRICS_SAMPLE_RATE', 1.0)
+
+
+def render_metrics():
+    lines = [
+        '# HELP roadmap_metrics_sample_rate Share of requests timed by the histograms',
+        '# TYPE roadmap_metrics_sample_rate gauge',
+        f'roadmap_metrics_sample_rate {_number(float(sample_rate()))}',
+    ]
+    for metric in METRICS:
+        lines.extend(metric.render())
+    lines.extend(_page_cache_lines())
+    return '\n'.join(lines) + '\n'
+
+
+# name, type, help and PageCache.stats() field of the page cache metrics
+PAGE_CACHE_METRICS = (
+    ('roadmap_page_cache_hits_total', 'counter', 'Signed-in roadmap pages served from the page cache', 'hits'),
+    ('roadmap_page_cache_misses_total', 'counter', 'Page cache lookups that had to render the page', 'misses'),
+    ('roadmap_page_cache_evictions_total', 'counter', 'Pages evicted to stay under the size cap', 'evictions'),
+    ('roadmap_page_cache_entries', 'gauge', 'Pages held in the page cache', 'entries'),
+    ('roadmap_page_cache_bytes', 'gauge', 'Total size of the cached pages', 'bytes'),
+    ('roadmap_page_cache_max_bytes', 'gauge', 'Size cap of the page cache', 'max_bytes'),
+)
+
+
+def _page_cache_lines():
+    stats = page_cache.stats()
+    lines = []
+    for name, kind, documentation, field in PAGE_CACHE_METRICS:
+        lines += [f'# HELP {name} {documentation}', f'# TYPE {name} {kind}', f'{name} {stats[field]}']
+    return lines
+
+
+def clear_metrics():
+    for metric in METRICS:
+        metric.clear()
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unresolved'
+
+
+def _new_sample():
+    """A sample for the next request, or None when it is not timed"""
+    rate = sample_rate()
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return None
+    return _Sample()
+
+
+def _record(request, sample):
+    view = _view_name(request)
+    REQUESTS.inc(view)
+    if sample is None:
+        return
+    REQUEST_SECONDS.observe(sample.elapsed, view)
+    SQL_QUERIES.observe(sample.queries, view)
+    SQL_SECONDS.observe(sample.sql_seconds, view)
+    for name, seconds in sample.stages.items():
+        STAGE_SECONDS.observe(seconds, view, name)
+
+
+class MetricsMiddleware:
+    """Record per-view request metrics; put it first in MIDDLEWARE"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        sample = _new_sample()
+        if sample is None:
+            response = self.get_response(request)
+        else:
+            with sample.timing():
+                response = self.get_response(request)
+        _record(request, sample)
+        return response
+
+    async def __acall__(self, request):
+        sample = _new_sample()
+        if sample is None:
+            response = await self.get_response(request)
+        else:
+            with sample.timing():
+                response = await self.get_response(request)
+        _record(request, sample)
+        return response
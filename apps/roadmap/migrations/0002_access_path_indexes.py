@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("roadmap", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="category",
+            index=models.Index(fields=["order"], name="roadmap_category_order"),
+        ),
+        migrations.AddIndex(
+            model_name="phase",
+            index=models.Index(
+                fields=["category", "order"], name="roadmap_phase_category_order"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="project",
+            index=models.Index(
+                fields=["phase", "order"], name="roadmap_project_phase_order"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="projectprogress",
+            index=models.Index(
+                condition=models.Q(("completed", True)),
+                fields=["user", "project"],
+                name="roadmap_projectprogress_done",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="topic",
+            index=models.Index(
+                fields=["phase", "order"], name="roadmap_topic_phase_order"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="topicprogress",
+            index=models.Index(
+                condition=models.Q(("completed", True)),
+                fields=["user", "topic"],
+                name="roadmap_topicprogress_done",
+            ),
+        ),
+    ]
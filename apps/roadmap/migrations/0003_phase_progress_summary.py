@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("roadmap", "0002_access_path_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PhaseProgressSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("topics_done", models.PositiveIntegerField(default=0)),
+                ("projects_done", models.PositiveIntegerField(default=0)),
+                (
+                    "phase",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="roadmap.phase"
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Phase progress summaries",
+                "unique_together": {("user", "phase")},
+            },
+        ),
+    ]
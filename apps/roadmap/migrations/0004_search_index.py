@@ -0,0 +1,47 @@
+from django.db import OperationalError, migrations
+
+# Kept inline rather than imported from apps.roadmap.search, so the
+# migration stays valid if that module changes. Rowids encode the item as
+# id * 4 + kind index (topic, project, phase, resource).
+SOURCES = [
+    ("roadmap_topic", "name", "''"),
+    ("roadmap_project", "name", "description"),
+    ("roadmap_phase", "title", "goal"),
+    ("roadmap_resource", "title", "description"),
+]
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite only; other databases use the in-process index
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                "CREATE VIRTUAL TABLE roadmap_search USING fts5("
+                "title, body, tokenize = 'porter unicode61')"
+            )
+        except OperationalError:
+            # SQLite built without FTS5
+            return
+        for index, (table, title, body) in enumerate(SOURCES):
+            cursor.execute(
+                f"INSERT INTO roadmap_search (rowid, title, body) "
+                f"SELECT id * 4 + {index}, {title}, {body} FROM {table}"
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS roadmap_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("roadmap", "0003_phase_progress_summary"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+# 0003 created the summary table empty; count existing progress into it.
+# Plain SQL so the migration does not depend on apps.roadmap.progress.
+BACKFILL_SQL = """
+INSERT INTO roadmap_phaseprogresssummary (user_id, phase_id, topics_done, projects_done)
+SELECT user_id, phase_id, SUM(topics_done), SUM(projects_done) FROM (
+    SELECT p.user_id, t.phase_id, 1 AS topics_done, 0 AS projects_done
+    FROM roadmap_topicprogress p JOIN roadmap_topic t ON t.id = p.topic_id
+    WHERE p.completed
+    UNION ALL
+    SELECT p.user_id, j.phase_id, 0, 1
+    FROM roadmap_projectprogress p JOIN roadmap_project j ON j.id = p.project_id
+    WHERE p.completed
+) AS done
+GROUP BY user_id, phase_id
+"""
+
+
+def backfill_summaries(apps, schema_editor):
+    # Rows written since 0003 may be partial; recount them all
+    schema_editor.execute("DELETE FROM roadmap_phaseprogresssummary")
+    schema_editor.execute(BACKFILL_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("roadmap", "0004_search_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("roadmap", "0005_backfill_phase_progress_summary"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="projectprogress",
+            name="roadmap_projectprogress_done",
+        ),
+        migrations.RemoveIndex(
+            model_name="topicprogress",
+            name="roadmap_topicprogress_done",
+        ),
+        migrations.AlterField(
+            model_name="phase",
+            name="category",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="phases",
+                to="roadmap.category",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="project",
+            name="phase",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="projects",
+                to="roadmap.phase",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="topic",
+            name="phase",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="topics",
+                to="roadmap.phase",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="projectprogress",
+            index=models.Index(
+                condition=models.Q(("completed", True)),
+                fields=["user", "project", "completed"],
+                name="roadmap_projectprogress_done",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="topicprogress",
+            index=models.Index(
+                condition=models.Q(("completed", True)),
+                fields=["user", "topic", "completed"],
+                name="roadmap_topicprogress_done",
+            ),
+        ),
+    ]
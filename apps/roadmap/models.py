@@ -10,12 +10,16 @@ class Category(models.Model):
     class Meta:
         ordering = ['order']
         verbose_name_plural = 'Categories'
+        indexes = [
+            models.Index(fields=['order'], name='roadmap_category_order'),
+        ]
     
     def __str__(self):
         return self.name
 
 class Phase(models.Model):
-    category = models.ForeignKey(Category, related_name='phases', on_delete=models.CASCADE)
+    # (category, order) below serves the foreign key too, so skip its own index
+    category = models.ForeignKey(Category, related_name='phases', on_delete=models.CASCADE, db_index=False)
     title = models.CharField(max_length=200)
     week_range = models.CharField(max_length=50)
     goal = models.TextField()
@@ -23,29 +27,40 @@ class Phase(models.Model):
     
     class Meta:
         ordering = ['category', 'order']
+        indexes = [
+            models.Index(fields=['category', 'order'], name='roadmap_phase_category_order'),
+        ]
 
     def __str__(self):
         return f"Phase {self.order}: {self.title}"
 
 class Topic(models.Model):
-    phase = models.ForeignKey(Phase, related_name='topics', on_delete=models.CASCADE)
+    # (phase, order) below serves the foreign key too, so skip its own index
+    phase = models.ForeignKey(Phase, related_name='topics', on_delete=models.CASCADE, db_index=False)
     name = models.CharField(max_length=200)
     order = models.IntegerField(default=0)
     
     class Meta:
         ordering = ['order']
+        indexes = [
+            models.Index(fields=['phase', 'order'], name='roadmap_topic_phase_order'),
+        ]
     
     def __str__(self):
         return self.name
 
 class Project(models.Model):
-    phase = models.ForeignKey(Phase, related_name='projects', on_delete=models.CASCADE)
+    # (phase, order) below serves the foreign key too, so skip its own index
+    phase = models.ForeignKey(Phase, related_name='projects', on_delete=models.CASCADE, db_index=False)
     name = models.CharField(max_length=200)
     description = models.TextField()
     order = models.IntegerField(default=0)
     
     class Meta:
         ordering = ['order']
+        indexes = [
+            models.Index(fields=['phase', 'order'], name='roadmap_project_phase_order'),
+        ]
     
     def __str__(self):
         return self.name
@@ -74,6 +89,13 @@ class TopicProgress(models.Model):
     
     class Meta:
         unique_together = ['user', 'topic']
+        indexes = [
+            # Partial index answering "which topics has this user completed" from
+            # the index alone; SQLite still reads ``completed`` to test the
+            # condition, so it is part of the key
+            models.Index(fields=['user', 'topic', 'completed'], condition=models.Q(completed=True),
+                         name='roadmap_topicprogress_done'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.topic.name} - {'Completed' if self.completed else 'In Progress'}"
@@ -87,6 +109,31 @@ class ProjectProgress(models.Model):
     
     class Meta:
         unique_together = ['user', 'project']
+        indexes = [
+            # Covering, like roadmap_topicprogress_done
+            models.Index(fields=['user', 'project', 'completed'], condition=models.Q(completed=True),
+                         name='roadmap_projectprogress_done'),
+        ]
     
     def __str__(self):
-        return f"{self.user.username} - {self.project.name} - {'Completed' if self.completed else 'In Progress'}"
\ No newline at end of file
+        return f"{self.user.username} - {self.project.name} - {'Completed' if self.completed else 'In Progress'}"
+
+class PhaseProgressSummary(models.Model):
+    """Denormalised per-user, per-phase completion counts
+
+    Kept in step with TopicProgress/ProjectProgress by the progress write
+    paths (see progress.refresh_phase_summaries), recounted by signals after
+    catalog deletes and admin edits, and rebuilt from scratch by the
+    ``rebuild_progress_summary`` command.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    phase = models.ForeignKey(Phase, on_delete=models.CASCADE)
+    topics_done = models.PositiveIntegerField(default=0)
+    projects_done = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['user', 'phase']
+        verbose_name_plural = 'Phase progress summaries'
+
+    def __str__(self):
+        return f"{self.user.username} - {self.phase.title} - {self.topics_done} topics, {self.projects_done} projects"
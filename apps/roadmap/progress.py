@@ -0,0 +1,465 @@
+"""Writes for per-user topic and project progress and its phase summaries"""
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .cache import bump_progress_version
+from .models import Topic, Project, TopicProgress, ProjectProgress, PhaseProgressSummary
+
+SUMMARY_FIELDS = ['topics_done', 'projects_done']
+
+
+def parse_changes(items):
+    """Normalise ``[{'id': 1, 'completed': true}, ...]`` into ``{id: bool}``
+
+    Raises ValueError for malformed entries.
+    """
+    changes = {}
+    for item in items or []:
+        if not isinstance(item, dict) or 'id' not in item:
+            raise ValueError('each change needs an "id"')
+        changes[int(item['id'])] = bool(item.get('completed', False))
+    return changes
+
+
+def _phase_ids(model, ids):
+    """Map each existing id in ``ids`` to its phase id"""
+    if not ids:
+        return {}
+    return dict(model.objects.filter(pk__in=ids).values_list('pk', 'phase_id'))
+
+
+def _done_per_phase(queryset, phase_path):
+    return dict(
+        queryset.filter(completed=True)
+        .values_list(phase_path)
+        .annotate(done=Count('pk'))
+        .order_by()
+    )
+
+
+def refresh_phase_summaries(user, phase_ids):
+    """Recount ``user``'s completed topics and projects for ``phase_ids``
+
+    One grouped count per progress model plus one upsert, so the cost
+    depends on the phases touched rather than on the user's history. Call
+    it inside the transaction that wrote the progress rows.
+    """
+    phase_ids = set(phase_ids)
+    if not phase_ids:
+        return
+    topics = _done_per_phase(
+        TopicProgress.objects.filter(user=user, topic__phase_id__in=phase_ids), 'topic__phase_id')
+    projects = _done_per_phase(
+        ProjectProgress.objects.filter(user=user, project__phase_id__in=phase_ids), 'project__phase_id')
+    PhaseProgressSummary.objects.bulk_create(
+        [
+            PhaseProgressSummary(user=user, phase_id=phase_id,
+                                 topics_done=topics.get(phase_id, 0),
+                                 projects_done=projects.get(phase_id, 0))
+            for phase_id in sorted(phase_ids)
+        ],
+        update_conflicts=True,
+        unique_fields=['user', 'phase'],
+        update_fields=SUMMARY_FIELDS,
+    )
+
+
+def recount_phase_summaries(phase_ids, create=True):
+    """Recount every user's summaries for ``phase_ids`` after catalog or admin edits
+
+    One grouped count per progress model over all users of the phases.
+    With ``create=False`` existing rows are updated but none are added, as
+    deletes need: a cascade may be about to remove the user or phase.
+    """
+    phase_ids = set(phase_ids)
+    if not phase_ids:
+        return
+    counts = defaultdict(lambda: [0, 0])
+    for index, (model, phase_path) in enumerate(
+            ((TopicProgress, 'topic__phase_id'), (ProjectProgress, 'project__phase_id'))):
+        rows = (model.objects.filter(completed=True, **{f'{phase_path}__in': phase_ids})
+                .values_list('user_id', phase_path)
+                .annotate(done=Count('pk'))
+                .order_by())
+        for user_id, phase_id, done in rows:
+            counts[(user_id, phase_id)][index] = done
+
+    stale = []
+    for summary in PhaseProgressSummary.objects.filter(phase_id__in=phase_ids):
+        done = counts.pop((summary.user_id, summary.phase_id), [0, 0])
+        if [summary.topics_done, summary.projects_done] != done:
+            summary.topics_done, summary.projects_done = done
+            stale.append(summary)
+    missing = counts if create else {}
+    PhaseProgressSummary.objects.bulk_update(stale, SUMMARY_FIELDS)
+    PhaseProgressSummary.objects.bulk_create([
+        PhaseProgressSummary(user_id=user_id, phase_id=phase_id,
+                             topics_done=topics_done, projects_done=projects_done)
+        for (user_id, phase_id), (topics_done, projects_done) in missing.items()
+    ])
+    for user_id in {summary.user_id for summary in stale} | {user_id for user_id, _ in missing}:
+        bump_progress_version(user_id)
+
+
+def rebuild_phase_summaries(user_ids=None, batch_size=1000):
+    """Recompute every summary row (or those of ``user_ids``) from the progress tables
+
+    Counts come from one grouped query per progress model over all users.
+    Returns the number of summary rows written.
+    """
+    topic_qs = TopicProgress.objects.all()
+    project_qs = ProjectProgress.objects.all()
+    summary_qs = PhaseProgressSummary.objects.all()
+    if user_ids is not None:
+        topic_qs = topic_qs.filter(user_id__in=user_ids)
+        project_qs = project_qs.filter(user_id__in=user_ids)
+        summary_qs = summary_qs.filter(user_id__in=user_ids)
+
+    counts = defaultdict(lambda: [0, 0])
+    for index, (queryset, phase_path) in enumerate(
+            ((topic_qs, 'topic__phase_id'), (project_qs, 'project__phase_id'))):
+        rows = (queryset.filter(completed=True)
+                .values_list('user_id', phase_path)
+                .annotate(done=Count('pk'))
+                .order_by())
+        for user_id, phase_id, done in rows:
+            counts[(user_id, phase_id)][index] = done
+
+    with transaction.atomic():
+        affected = set(summary_qs.values_list('user_id', flat=True).distinct())
+        summary_qs.delete()
+        PhaseProgressSummary.objects.bulk_create(
+            [
+                PhaseProgressSummary(user_id=user_id, phase_id=phase_id,
+                                     topics_done=topics_done, projects_done=projects_done)
+                for (user_id, phase_id), (topics_done, projects_done) in counts.items()
+            ],
+            batch_size=batch_size,
+        )
+    for user_id in affected | {user_id for user_id, _ in counts}:
+        bump_progress_version(user_id)
+    return len(counts)
+
+
+@contextmanager
+def progress_write(user):
+    """Transaction for progress rows written without model signals
+
+    Upserts, bulk_create and raw SQL send no post_save, so the receivers in
+    ``signals.py`` that recount phase summaries and invalidate the user's
+    cached page never run for these writes. Add the touched phase ids to
+    the yielded set: they are recounted before commit, and the cached page
+    is invalidated afterwards when any were touched.
+    """
+    phase_ids = set()
+    with transaction.atomic():
+        yield phase_ids
+        refresh_phase_summaries(user, phase_ids)
+    if phase_ids:
+        bump_progress_version(user.pk)
+
+
+def save_topic_instances(user, instances):
+    """Save TopicProgress instances from the roadmap formset with their summaries
+
+    Every changed row goes out in one upsert rather than one UPDATE per form.
+    """
+    if not instances:
+        return
+    with progress_write(user) as phase_ids:
+        _upsert(TopicProgress, 'topic', user, {inst.topic_id: inst.completed for inst in instances})
+        # Topics come from the catalog lookup, so phase_id needs no query
+        phase_ids.update(inst.topic.phase_id for inst in instances)
+
+
+# Flip (or keep) ``completed`` and optionally replace ``github_link`` in one
+# statement. The row lock taken by the upsert makes concurrent toggles of the
+# same project serialise instead of losing updates, and selecting from the
+# project table inserts nothing for an unknown project.
+_TOGGLE_SQL = """
+INSERT INTO {progress} (user_id, project_id, completed, completed_at, github_link)
+SELECT %s, id, %s, %s, COALESCE(CAST(%s AS TEXT), '') FROM {project} WHERE id = %s
+ON CONFLICT (user_id, project_id) DO UPDATE SET
+    completed = CASE WHEN %s THEN NOT {progress}.completed ELSE {progress}.completed END,
+    completed_at = excluded.completed_at,
+    github_link = COALESCE(CAST(%s AS TEXT), {progress}.github_link)
+RETURNING completed
+"""
+
+# Bind parameters one statement may carry on PostgreSQL
+MAX_QUERY_PARAMS = 65535
+
+# Backends that support INSERT ... ON CONFLICT ... RETURNING
+_UPSERT_VENDORS = {'sqlite', 'postgresql'}
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def _toggle_row(cursor, user, project_id, flip, github_link):
+    """Apply one toggle; returns the new completed state or None for an unknown project
+
+    ``github_link=None`` keeps the stored link.
+    """
+    if connection.vendor not in _UPSERT_VENDORS:
+        return _toggle_row_locked(user, project_id, flip, github_link)
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    cursor.execute(
+        _TOGGLE_SQL.format(progress=_table(ProjectProgress), project=_table(Project)),
+        [user.pk, flip, now, github_link, project_id, flip, github_link],
+    )
+    row = cursor.fetchone()
+    return None if row is None else bool(row[0])
+
+
+def _toggle_row_locked(user, project_id, flip, github_link):
+    """_toggle_row for backends without upsert RETURNING: lock the row, then write it"""
+    if not Project.objects.filter(pk=project_id).exists():
+        return None
+    progress, created = (ProjectProgress.objects.select_for_update()
+                         .get_or_create(user=user, project_id=project_id,
+                                        defaults={'completed': flip, 'github_link': github_link or ''}))
+    if not created:
+        progress.completed = progress.completed != flip
+        if github_link is not None:
+            progress.github_link = github_link
+        progress.save()
+    return progress.completed
+
+
+def toggle_project(user, project_id, github_link=''):
+    """Flip one project's completed flag and update its phase summary
+
+    One upsert flips the flag (the first toggle marks the project completed)
+    and the phase summary is recounted. Returns the new completed state;
+    raises ValueError for an unknown project.
+    """
+    project_id = int(project_id)
+    with progress_write(user) as phase_ids, connection.cursor() as cursor:
+        completed = _toggle_row(cursor, user, project_id, True, github_link)
+        if completed is None:
+            raise ValueError(f'unknown project {project_id}')
+        phase_ids.update(_phase_ids(Project, [project_id]).values())
+    return completed
+
+
+def parse_toggles(items):
+    """Normalise ``[{'id': 1, 'toggle': true, 'github_link': '...'}, ...]``
+
+    ``toggle`` defaults to true and a missing ``github_link`` keeps the
+    stored one. Entries for the same project are merged in order, so two
+    toggles cancel out and the last link wins. Returns
+    ``{id: (flip, github_link)}``; raises ValueError for malformed entries.
+    """
+    toggles = {}
+    for item in items or []:
+        if not isinstance(item, dict) or 'id' not in item:
+            raise ValueError('each toggle needs an "id"')
+        link = item.get('github_link')
+        if link is not None and not isinstance(link, str):
+            raise ValueError('"github_link" must be a string')
+        flip, old_link = toggles.get(int(item['id']), (False, None))
+        toggles[int(item['id'])] = (
+            flip != bool(item.get('toggle', True)),
+            old_link if link is None else link,
+        )
+    return toggles
+
+
+def toggle_projects(user, toggles):
+    """Apply many project toggles and link updates in one transaction
+
+    ``toggles`` maps project ids to ``(flip, github_link)`` as returned by
+    parse_toggles. Unknown ids raise ValueError before anything is written.
+    Each project is one upsert statement and the touched phases are
+    recounted once at the end. Returns ``{project_id: completed}``.
+    """
+    phases = _phase_ids(Project, toggles)
+    unknown = set(toggles) - set(phases)
+    if unknown:
+        raise ValueError(f'unknown projects {sorted(unknown)}')
+
+    results = {}
+    with progress_write(user) as phase_ids, connection.cursor() as cursor:
+        for project_id, (flip, github_link) in sorted(toggles.items()):
+            results[project_id] = _toggle_row(cursor, user, project_id, flip, github_link)
+        phase_ids.update(phases.values())
+    return results
+
+
+def _upsert(model, fk_name, user, changes):
+    rows = [
+        model(user=user, completed=completed, **{f'{fk_name}_id': pk})
+        for pk, completed in changes.items()
+    ]
+    model.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['user', fk_name],
+        update_fields=['completed', 'completed_at'],
+    )
+
+
+def save_progress(user, topic_changes, project_changes):
+    """Write only the changed rows with one upsert per model
+
+    ``topic_changes`` and ``project_changes`` map ids to the new completed
+    state. Unknown ids raise ValueError before anything is written. The
+    phase summaries of every touched phase are recounted in the same
+    transaction.
+    """
+    topic_phases = _phase_ids(Topic, topic_changes)
+    project_phases = _phase_ids(Project, project_changes)
+    unknown_topics = set(topic_changes) - set(topic_phases)
+    unknown_projects = set(project_changes) - set(project_phases)
+    if unknown_topics or unknown_projects:
+        raise ValueError(
+            f'unknown topics {sorted(unknown_topics)} / projects {sorted(unknown_projects)}'
+        )
+
+    with progress_write(user) as phase_ids:
+        if topic_changes:
+            _upsert(TopicProgress, 'topic', user, topic_changes)
+        if project_changes:
+            _upsert(ProjectProgress, 'project', user, project_changes)
+        phase_ids.update(topic_phases.values(), project_phases.values())
+
+
+# Last-writer-wins upsert: a row only changes when the client's timestamp is
+# newer than the stored completed_at
+_SYNC_SQL = """
+INSERT INTO {table} (user_id, {fk}, completed, completed_at{extra_columns}) VALUES {rows}
+ON CONFLICT (user_id, {fk}) DO UPDATE SET
+    completed = excluded.completed,
+    completed_at = excluded.completed_at
+WHERE excluded.completed_at > {table}.completed_at
+"""
+
+
+def _timestamp(value, default):
+    """Client milliseconds since the epoch as an aware datetime, never later than ``default``"""
+    if value is None:
+        return default
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError('timestamps must be milliseconds since the epoch')
+    try:
+        moment = datetime.fromtimestamp(value / 1000, tz=dt_timezone.utc)
+    except (OverflowError, OSError) as exc:
+        raise ValueError(f'timestamp {value} is out of range') from exc
+    # A client clock running ahead must not win every later merge
+    return min(moment, default)
+
+
+def parse_sync(payload):
+    """Normalise a sync payload into ``({topic_id: (completed, at)}, {project_id: ...})``
+
+    The payload has the checked.json shape, ``{"topics": [1, 2], "projects": [3]}``,
+    where bare ids are completed items, plus an optional ``updated_at`` in
+    milliseconds since the epoch for all of them. Entries may also be
+    objects, ``{"id": 4, "completed": false, "updated_at": ...}``, to carry
+    unticked items and per-item timestamps. Missing timestamps mean now.
+    Raises ValueError for malformed entries.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError('expected a JSON object')
+    now = timezone.now()
+    default = _timestamp(payload.get('updated_at'), now)
+    parsed = []
+    for key in ('topics', 'projects'):
+        changes = {}
+        for item in payload.get(key) or []:
+            if isinstance(item, dict):
+                if 'id' not in item:
+                    raise ValueError(f'each entry of "{key}" needs an "id"')
+                changes[int(item['id'])] = (bool(item.get('completed', True)),
+                                            _timestamp(item.get('updated_at'), default))
+            else:
+                changes[int(item)] = (True, default)
+        parsed.append(changes)
+    return tuple(parsed)
+
+
+def _sync_rows(cursor, model, fk_name, user, changes):
+    """Upsert ``changes`` in as few statements as the backend's parameter limit allows"""
+    if not changes:
+        return 0
+    columns = ['user_id', f'{fk_name}_id', 'completed', 'completed_at']
+    items = sorted(changes.items())
+    # Only SQLite and Oracle report a limit; elsewhere bulk_batch_size
+    # returns every item, so stay under PostgreSQL's parameter cap
+    batch_size = min(connection.ops.bulk_batch_size(columns, items), MAX_QUERY_PARAMS // len(columns))
+    # Project rows also need the NOT NULL link on insert
+    extra_columns, extra_values = (', github_link', ", ''") if model is ProjectProgress else ('', '')
+    written = 0
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        sql = _SYNC_SQL.format(
+            table=_table(model),
+            fk=f'{fk_name}_id',
+            extra_columns=extra_columns,
+            rows=', '.join([f'(%s, %s, %s, %s{extra_values})'] * len(batch)),
+        )
+        params = []
+        for pk, (completed, at) in batch:
+            params.extend([user.pk, pk, completed, connection.ops.adapt_datetimefield_value(at)])
+        cursor.execute(sql, params)
+        written += max(cursor.rowcount, 0)
+    return written
+
+
+def _sync_rows_locked(model, fk_name, user, changes):
+    """_sync_rows for backends without conditional upserts; completed_at becomes now"""
+    stored = dict(model.objects.select_for_update()
+                  .filter(user=user, **{f'{fk_name}_id__in': changes})
+                  .values_list(f'{fk_name}_id', 'completed_at'))
+    newer = {pk: completed for pk, (completed, at) in changes.items()
+             if pk not in stored or at > stored[pk]}
+    if newer:
+        _upsert(model, fk_name, user, newer)
+    return len(newer)
+
+
+def sync_progress(user, topic_changes, project_changes):
+    """Merge offline progress into ``user``'s rows, last writer wins
+
+    ``topic_changes`` and ``project_changes`` map ids to ``(completed,
+    at)`` as returned by parse_sync. A change is applied when its row is
+    missing or was last written before ``at``; ``at`` then becomes the
+    row's completed_at. Ids no longer in the catalog are skipped, since the
+    static site may be older than the database. Writes are chunked
+    multi-row upserts, so a few thousand items take a handful of queries.
+    Returns ``(topics written, projects written, ids skipped)``.
+    """
+    topic_phases = _phase_ids(Topic, topic_changes)
+    project_phases = _phase_ids(Project, project_changes)
+    skipped = (len(topic_changes) - len(topic_phases)) + (len(project_changes) - len(project_phases))
+    topic_changes = {pk: change for pk, change in topic_changes.items() if pk in topic_phases}
+    project_changes = {pk: change for pk, change in project_changes.items() if pk in project_phases}
+
+    with progress_write(user) as phase_ids:
+        if connection.vendor in _UPSERT_VENDORS:
+            with connection.cursor() as cursor:
+                topics = _sync_rows(cursor, TopicProgress, 'topic', user, topic_changes)
+                projects = _sync_rows(cursor, ProjectProgress, 'project', user, project_changes)
+        else:
+            topics = _sync_rows_locked(TopicProgress, 'topic', user, topic_changes)
+            projects = _sync_rows_locked(ProjectProgress, 'project', user, project_changes)
+        if topics or projects:
+            phase_ids.update(topic_phases.values(), project_phases.values())
+    return topics, projects, skipped
+
+
+def completed_ids(user):
+    """``{'topics': [...], 'projects': [...]}`` of ``user``'s completed items, as in checked.json"""
+    return {
+        'topics': sorted(TopicProgress.objects.filter(user=user, completed=True)
+                         .values_list('topic_id', flat=True)),
+        'projects': sorted(ProjectProgress.objects.filter(user=user, completed=True)
+                           .values_list('project_id', flat=True)),
+    }
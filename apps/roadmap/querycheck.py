@@ -0,0 +1,153 @@
+"""Detect N+1 patterns: the same query shape run over and over in one request
+
+Queries are fingerprinted by replacing literals and parameter lists with
+placeholders, so ``WHERE id = 1`` and ``WHERE id = 2`` count as the same
+shape. QueryCheckMiddleware reports shapes repeated ``threshold`` times or
+more in a request (``ROADMAP_QUERYCHECK = 'log'`` or ``'raise'``) together
+with the project code that issued them. QueryCheckMixin offers the same
+check, plus query budgets, to tests.
+"""
+import logging
+import re
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import hooks
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 5
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LIST = re.compile(r'\((?:\s*(?:\?|%s)\s*,)+\s*(?:\?|%s)\s*\)')
+_SPACE = re.compile(r'\s+')
+# Frames of the recording machinery itself are never the call site
+_OWN_FILES = {Path(__file__).resolve(), Path(hooks.__file__).resolve()}
+
+
+class RepeatedQueriesError(Exception):
+    pass
+
+
+def fingerprint(sql):
+    """Normalise ``sql`` so queries differing only in values compare equal"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _LIST.sub('(...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def _call_site():
+    """The innermost frame of project code (outside the recorder and site-packages)"""
+    root = str(Path(settings.BASE_DIR).resolve())
+    for frame in reversed(traceback.extract_stack()):
+        filename = frame.filename
+        if (filename.startswith(root) and 'site-packages' not in filename
+                and Path(filename).resolve() not in _OWN_FILES):
+            return f'{filename}:{frame.lineno} in {frame.name}'
+    return 'unknown'
+
+
+class QueryRecorder:
+    """Record the fingerprint and call site of every query run in this context"""
+
+    def __init__(self):
+        self.queries = []
+        self._hook = None
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((fingerprint(sql), _call_site()))
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._hook = hooks.query_hook(self)
+        self._hook.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._hook.__exit__(*exc_info)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def repeated(self, threshold=DEFAULT_THRESHOLD):
+        """``[(fingerprint, count, call sites)]`` for shapes run ``threshold``+ times"""
+        counts = Counter(shape for shape, _ in self.queries)
+        return [
+            (shape, count, sorted({site for s, site in self.queries if s == shape}))
+            for shape, count in counts.most_common()
+            if count >= threshold
+        ]
+
+
+def describe(repeats):
+    lines = []
+    for shape, count, sites in repeats:
+        lines.append(f'{count}x {shape}')
+        lines.extend(f'    from {site}' for site in sites)
+    return '\n'.join(lines)
+
+
+class QueryCheckMiddleware:
+    """Report repeated query shapes per request; active when ROADMAP_QUERYCHECK is set"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.mode = getattr(settings, 'ROADMAP_QUERYCHECK', '')
+        if self.mode not in ('log', 'raise'):
+            raise MiddlewareNotUsed
+        self.threshold = getattr(settings, 'ROADMAP_QUERYCHECK_THRESHOLD', DEFAULT_THRESHOLD)
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        self.report(request, recorder)
+        return response
+
+    async def __acall__(self, request):
+        with QueryRecorder() as recorder:
+            response = await self.get_response(request)
+        self.report(request, recorder)
+        return response
+
+    def report(self, request, recorder):
+        repeats = recorder.repeated(self.threshold)
+        if repeats:
+            message = f'{request.method} {request.path} repeated queries:\n{describe(repeats)}'
+            if self.mode == 'raise':
+                raise RepeatedQueriesError(message)
+            logger.warning(message)
+
+
+class QueryCheckMixin:
+    """TestCase mixin with N+1 and query budget assertions"""
+
+    @contextmanager
+    def assertNoRepeatedQueries(self, threshold=DEFAULT_THRESHOLD):
+        with QueryRecorder() as recorder:
+            yield recorder
+        repeats = recorder.repeated(threshold)
+        if repeats:
+            self.fail(f'Queries repeated {threshold}+ times:\n{describe(repeats)}')
+
+    @contextmanager
+    def assertMaxQueries(self, budget):
+        with QueryRecorder() as recorder:
+            yield recorder
+        if len(recorder) > budget:
+            shapes = '\n'.join(f'    {site}: {shape}' for shape, site in recorder.queries)
+            self.fail(f'{len(recorder)} queries exceed the budget of {budget}:\n{shapes}')
@@ -0,0 +1,45 @@
+"""Database routing for deployments with a read replica
+
+CatalogReplicaRouter sends reads of the catalog (categories, phases, topics,
+projects and resources) to the alias named by ``ROADMAP_REPLICA_DATABASE``
+and everything else, including every write, to the primary. Progress rows
+are always read from the primary so users see their own ticks at once.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+CATALOG_MODELS = {'category', 'phase', 'topic', 'project', 'resource', 'resource_phases'}
+
+
+def replica_alias():
+    """The configured replica alias, or None to read everything from the primary"""
+    return getattr(settings, 'ROADMAP_REPLICA_DATABASE', None) or None
+
+
+def is_catalog_model(model):
+    return model._meta.app_label == 'roadmap' and model._meta.model_name in CATALOG_MODELS
+
+
+class CatalogReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = replica_alias()
+        if replica is None or not is_catalog_model(model):
+            return None
+        # Related rows come from wherever their instance was read
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        # Inside a transaction the replica cannot see rows written so far
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds a copy of the primary, so rows relate across both
+        aliases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
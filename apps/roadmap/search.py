@@ -0,0 +1,309 @@
+"""Ranked full-text search over topics, projects, phases and resources
+
+Two interchangeable backends:
+
+``fts5``
+    A SQLite FTS5 table, ``roadmap_search`` (migration 0004), kept in step
+    row by row by the signals in ``signals.py``; bulk edits run in
+    ``catalog.bulk_catalog_edit``, which calls ``rebuild_index`` once
+    instead. Results are ranked by FTS5's bm25.
+``memory``
+    An inverted index built in-process from the cached catalog tree and
+    rebuilt whenever the catalog version changes. It serves databases
+    without FTS5.
+
+``ROADMAP_SEARCH_BACKEND`` picks one; the default, ``'auto'``, uses FTS5
+when the table exists. Every result carries the category and phase path
+of the item, taken from the cached tree, so a search costs one query at
+most.
+"""
+import heapq
+import math
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+from .cache import get_catalog_version, get_tree
+from .models import Phase, Topic, Project, Resource
+
+TABLE = 'roadmap_search'
+
+# FTS rowids encode the item: object id * len(KINDS) + kind index
+KINDS = ('topic', 'project', 'phase', 'resource')
+
+# Model, title field and body field (if any) per kind
+SOURCES = {
+    'topic': (Topic, 'name', None),
+    'project': (Project, 'name', 'description'),
+    'phase': (Phase, 'title', 'goal'),
+    'resource': (Resource, 'title', 'description'),
+}
+
+# Matches in the title count this many times more than matches in the body
+TITLE_WEIGHT = 5.0
+MAX_TERMS = 10
+MAX_LIMIT = 100
+
+_TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+def _rowid(kind, object_id):
+    return object_id * len(KINDS) + KINDS.index(kind)
+
+
+def _document(kind, instance):
+    """``(title, body)`` of a catalog instance as stored in the index"""
+    _, title, body = SOURCES[kind]
+    return getattr(instance, title), getattr(instance, body) if body else ''
+
+
+_fts_tables = {}
+
+
+def backend():
+    """``'fts5'`` or ``'memory'``, per ROADMAP_SEARCH_BACKEND and the database"""
+    choice = getattr(settings, 'ROADMAP_SEARCH_BACKEND', 'auto')
+    if choice != 'auto':
+        return choice
+    if connection.vendor != 'sqlite':
+        return 'memory'
+    # The table only exists where the migration found FTS5; look once per database
+    name = connection.settings_dict['NAME']
+    if name not in _fts_tables:
+        _fts_tables[name] = TABLE in connection.introspection.table_names()
+    return 'fts5' if _fts_tables[name] else 'memory'
+
+
+def index_object(kind, instance):
+    """Add or replace one catalog item in the FTS5 table"""
+    if backend() != 'fts5':
+        return
+    title, body = _document(kind, instance)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [_rowid(kind, instance.pk)])
+        cursor.execute(f'INSERT INTO {TABLE} (rowid, title, body) VALUES (%s, %s, %s)',
+                       [_rowid(kind, instance.pk), title, body])
+
+
+def unindex_object(kind, object_id):
+    if backend() != 'fts5':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [_rowid(kind, object_id)])
+
+
+def rebuild_index():
+    """Refill the FTS5 table from the catalog tables; call after bulk writes
+
+    A no-op for the memory backend, which follows the catalog version.
+    """
+    if backend() != 'fts5':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        for index, kind in enumerate(KINDS):
+            model, title, body = SOURCES[kind]
+            body_sql = body or "''"
+            cursor.execute(
+                f'INSERT INTO {TABLE} (rowid, title, body) '
+                f'SELECT id * {len(KINDS)} + {index}, {title}, {body_sql} FROM {model._meta.db_table}'
+            )
+
+
+def _fts_query(terms):
+    # Every term must match, as a prefix; quoting keeps FTS5 syntax out
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _search_fts(terms, limit, kind):
+    sql = (f'SELECT rowid, title, -bm25({TABLE}, {TITLE_WEIGHT}, 1.0) FROM {TABLE} '
+           f'WHERE {TABLE} MATCH %s')
+    params = [_fts_query(terms)]
+    if kind is not None:
+        sql += f' AND rowid %% {len(KINDS)} = %s'
+        params.append(KINDS.index(kind))
+    sql += f' ORDER BY bm25({TABLE}, {TITLE_WEIGHT}, 1.0) LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [
+            (KINDS[rowid % len(KINDS)], rowid // len(KINDS), title, score)
+            for rowid, title, score in cursor.fetchall()
+        ]
+
+
+def _common(candidates, docs):
+    """Documents in both, iterating over the smaller of the two"""
+    if len(candidates) < len(docs):
+        return [doc for doc in candidates if doc in docs]
+    return [doc for doc in docs if doc in candidates]
+
+
+class MemoryIndex:
+    """Inverted index over ``(kind, id, title, body)`` documents
+
+    Scores are BM25 over the title-weighted term frequencies; a query term
+    matches every indexed token it is a prefix of.
+    """
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, documents):
+        self.documents = []
+        lengths = []
+        postings = defaultdict(dict)
+        for kind, object_id, title, body in documents:
+            doc = len(self.documents)
+            self.documents.append((kind, object_id, title))
+            weights = defaultdict(float)
+            for token in tokenize(title):
+                weights[token] += TITLE_WEIGHT
+            for token in tokenize(body):
+                weights[token] += 1.0
+            lengths.append(sum(weights.values()))
+            for token, weight in weights.items():
+                postings[token][doc] = weight
+        self.postings = dict(postings)
+        self.vocabulary = sorted(self.postings)
+        average = (sum(lengths) / len(lengths)) if lengths else 0.0
+        # BM25 length normalisation, fixed per document
+        self.norms = [self.k1 * (1 - self.b + self.b * length / average) for length in lengths]
+
+    def _expand(self, term):
+        for index in range(bisect_left(self.vocabulary, term), len(self.vocabulary)):
+            token = self.vocabulary[index]
+            if not token.startswith(term):
+                break
+            yield token
+
+    def search(self, terms, limit, kind=None):
+        # Posting lists per term, rarest term first: its matches are the
+        # only candidates, so common terms are scored for those alone
+        matches = sorted(
+            ([self.postings[token] for token in self._expand(term)] for term in terms),
+            key=lambda postings: sum(map(len, postings)),
+        )
+        candidates = set().union(*matches[0])
+        for postings in matches[1:]:
+            candidates &= set().union(*(_common(candidates, docs) for docs in postings))
+        if kind is not None:
+            candidates = {doc for doc in candidates if self.documents[doc][0] == kind}
+        if not candidates:
+            return []
+
+        total = len(self.documents)
+        scores = dict.fromkeys(candidates, 0.0)
+        for postings in matches:
+            for docs in postings:
+                idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc in _common(candidates, docs):
+                    weight = docs[doc]
+                    scores[doc] += idf * weight * (self.k1 + 1) / (weight + self.norms[doc])
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(*self.documents[doc], score) for doc, score in best]
+
+
+def _tree_documents(tree):
+    resources = {}
+    for category in tree:
+        for phase in category.phases:
+            yield 'phase', phase.id, phase.title, phase.goal
+            for topic in phase.topics:
+                yield 'topic', topic.id, topic.name, ''
+            for project in phase.projects:
+                yield 'project', project.id, project.name, project.description
+            for resource in phase.resources:
+                resources[resource.id] = resource
+    for resource in resources.values():
+        yield 'resource', resource.id, resource.title, resource.description
+
+
+def _tree_paths(tree):
+    """Map ``(kind, id)`` to the ``(category, phase)`` pairs it appears under"""
+    paths = defaultdict(list)
+    for category in tree:
+        for phase in category.phases:
+            location = (category, phase)
+            paths['phase', phase.id].append(location)
+            for topic in phase.topics:
+                paths['topic', topic.id].append(location)
+            for project in phase.projects:
+                paths['project', project.id].append(location)
+            for resource in phase.resources:
+                paths['resource', resource.id].append(location)
+    return dict(paths)
+
+
+class _Catalog:
+    """Paths and, on first use, the memory index of one catalog version"""
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.paths = _tree_paths(tree)
+        self._index = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = MemoryIndex(_tree_documents(self.tree))
+        return self._index
+
+
+_local = (None, None)
+
+
+def _catalog():
+    global _local
+    version = get_catalog_version()
+    if _local[0] != version:
+        _local = (version, _Catalog(get_tree()))
+    return _local[1]
+
+
+def search(query, limit=20, kind=None):
+    """Ranked matches for ``query``, best first
+
+    Each term of ``query`` must match a word of the item as a prefix.
+    Returns dicts with the item's ``kind``, ``id``, ``title``, ``score``
+    and ``path``: the categories and phases it belongs to (resources may
+    sit in several phases). Items missing from the catalog tree, such as
+    resources attached to no phase, have an empty path.
+    """
+    terms = tokenize(query)[:MAX_TERMS]
+    if not terms:
+        return []
+    if kind is not None and kind not in KINDS:
+        raise ValueError(f'unknown kind {kind!r}')
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    catalog = _catalog()
+    if backend() == 'fts5':
+        matches = _search_fts(terms, limit, kind)
+    else:
+        matches = catalog.index.search(terms, limit, kind)
+    return [
+        {
+            'kind': match_kind,
+            'id': object_id,
+            'title': title,
+            'score': round(score, 4),
+            'path': [
+                {
+                    'category': category.code,
+                    'category_name': category.name,
+                    'phase_id': phase.id,
+                    'phase_order': phase.order,
+                    'phase': phase.title,
+                }
+                for category, phase in catalog.paths.get((match_kind, object_id), ())
+            ],
+        }
+        for match_kind, object_id, title, score in matches
+    ]
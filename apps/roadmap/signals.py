@@ -0,0 +1,146 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models import QuerySet
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from . import hooks, search
+from .cache import bump_catalog_version, bump_progress_version
+from .catalog import current_bulk_edit
+from .models import Category, Phase, Topic, Project, Resource, TopicProgress, ProjectProgress
+from .progress import recount_phase_summaries, refresh_phase_summaries
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Phase)
+@receiver(post_delete, sender=Phase)
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=Resource)
+@receiver(post_delete, sender=Resource)
+@receiver(m2m_changed, sender=Resource.phases.through)
+def invalidate_catalog(sender, **kwargs):
+    """Any catalog edit invalidates the cached roadmap tree"""
+    if current_bulk_edit() is None:
+        bump_catalog_version()
+
+
+_SEARCH_KINDS = {Topic: 'topic', Project: 'project', Phase: 'phase', Resource: 'resource'}
+
+
+@receiver(post_save, sender=Phase)
+@receiver(post_save, sender=Topic)
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=Resource)
+def index_for_search(sender, instance, **kwargs):
+    """Keep the search index in step with catalog edits; bulk edits rebuild it once"""
+    edit = current_bulk_edit()
+    if edit is not None:
+        edit.reindex = True
+    else:
+        search.index_object(_SEARCH_KINDS[sender], instance)
+
+
+@receiver(post_delete, sender=Phase)
+@receiver(post_delete, sender=Topic)
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Resource)
+def unindex_for_search(sender, instance, **kwargs):
+    edit = current_bulk_edit()
+    if edit is not None:
+        edit.reindex = True
+    else:
+        search.unindex_object(_SEARCH_KINDS[sender], instance.pk)
+
+
+@receiver(post_save, sender=TopicProgress)
+@receiver(post_delete, sender=TopicProgress)
+@receiver(post_save, sender=ProjectProgress)
+@receiver(post_delete, sender=ProjectProgress)
+def invalidate_progress(sender, instance, **kwargs):
+    """Progress edits invalidate that user's cached roadmap page"""
+    edit = current_bulk_edit()
+    if edit is not None:
+        edit.user_ids.add(instance.user_id)
+    else:
+        bump_progress_version(instance.user_id)
+
+
+# Progress model -> the catalog model its rows point at
+_PROGRESS_ITEMS = {TopicProgress: Topic, ProjectProgress: Project}
+
+
+@receiver(post_save, sender=TopicProgress)
+@receiver(post_delete, sender=TopicProgress)
+@receiver(post_save, sender=ProjectProgress)
+@receiver(post_delete, sender=ProjectProgress)
+def refresh_summary(sender, instance, origin=None, **kwargs):
+    """Recount the phase summary after single-row progress edits, e.g. in the admin
+
+    Progress deleted along with its item, phase or user is left to the
+    receivers below or to the summary's own cascade.
+    """
+    if origin is not None:
+        origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+        if origin_model is not sender:
+            return
+    item = _PROGRESS_ITEMS[sender]
+    item_id = instance.topic_id if sender is TopicProgress else instance.project_id
+    phase_id = item.objects.filter(pk=item_id).values_list('phase_id', flat=True).first()
+    if phase_id is not None:
+        refresh_phase_summaries(instance.user, [phase_id])
+
+
+@receiver(pre_save, sender=Topic)
+@receiver(pre_save, sender=Project)
+def remember_phase(sender, instance, **kwargs):
+    if current_bulk_edit() is not None:
+        return
+    instance._saved_phase_id = (
+        sender.objects.filter(pk=instance.pk).values_list('phase_id', flat=True).first()
+        if instance.pk is not None else None
+    )
+
+
+@receiver(post_save, sender=Topic)
+@receiver(post_save, sender=Project)
+def recount_moved_item(sender, instance, created, **kwargs):
+    """An item moved to another phase takes its progress along"""
+    previous = getattr(instance, '_saved_phase_id', None)
+    if not created and previous is not None and previous != instance.phase_id:
+        recount_phase_summaries([previous, instance.phase_id])
+
+
+@receiver(post_delete, sender=Topic)
+@receiver(post_delete, sender=Project)
+def recount_after_item_delete(sender, instance, **kwargs):
+    """Progress rows cascade with the item; bulk edits recount once at the end"""
+    edit = current_bulk_edit()
+    if edit is not None:
+        edit.phase_ids.add(instance.phase_id)
+    else:
+        recount_phase_summaries([instance.phase_id], create=False)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Use write-ahead logging on SQLite files so readers and a writer can overlap
+
+    The busy timeout comes from the ``timeout`` database option.
+    """
+    if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+        return
+    if getattr(settings, 'ROADMAP_SQLITE_WAL', True):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=WAL')
+            # Durable at checkpoints rather than at every commit; safe with WAL
+            cursor.execute('PRAGMA synchronous=NORMAL')
+
+
+@receiver(connection_created)
+def install_query_hooks(sender, connection, **kwargs):
+    """Let request-scoped hooks (metrics, query checks) see this connection's queries"""
+    hooks.install(connection)
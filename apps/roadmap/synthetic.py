@@ -0,0 +1,91 @@
+"""Synthetic catalogs and users for benchmarks
+
+Everything generated is tagged by ``prefix``: category codes start with it
+and usernames with its lowercase form, so a synthetic catalog can live next
+to the real one and be removed again with ``clear_synthetic``.
+"""
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+
+from .catalog import bulk_catalog_edit
+from .models import Category, Phase, Topic, Project, TopicProgress, ProjectProgress
+from .progress import rebuild_phase_summaries
+
+DEFAULT_PREFIX = 'SYN'
+BATCH_SIZE = 2000
+
+
+def clear_synthetic(prefix=DEFAULT_PREFIX):
+    """Delete synthetic categories and users (and, by cascade, their progress)"""
+    with bulk_catalog_edit():
+        User.objects.filter(username__startswith=f'{prefix.lower()}-').delete()
+        Category.objects.filter(code__startswith=prefix).delete()
+
+
+def generate_catalog(categories=2, phases=5, topics=20, projects=3, users=10, progress=0.3,
+                     seed=0, prefix=DEFAULT_PREFIX):
+    """Create a synthetic catalog plus users with random progress
+
+    ``phases`` is per category and ``topics``/``projects`` are per phase.
+    Each user completes every topic and project with probability
+    ``progress``. Existing synthetic data with the same ``prefix`` is
+    replaced. Returns the number of rows created per model.
+    """
+    rng = random.Random(seed)
+    clear_synthetic(prefix)
+    with bulk_catalog_edit() as edit:
+        category_objs = Category.objects.bulk_create([
+            Category(name=f'Synthetic Path {i}', code=f'{prefix}{i}',
+                     description=f'Generated category {i}', order=1000 + i)
+            for i in range(1, categories + 1)
+        ])
+        phase_objs = Phase.objects.bulk_create([
+            Phase(category=category, title=f'{category.code} phase {j}', week_range=f'Weeks {j}',
+                  goal=f'Goal of phase {j}', order=j)
+            for category in category_objs
+            for j in range(1, phases + 1)
+        ], batch_size=BATCH_SIZE)
+        topic_objs = Topic.objects.bulk_create([
+            Topic(phase=phase, name=f'Topic {phase.pk}.{k}', order=k)
+            for phase in phase_objs
+            for k in range(1, topics + 1)
+        ], batch_size=BATCH_SIZE)
+        project_objs = Project.objects.bulk_create([
+            Project(phase=phase, name=f'Project {phase.pk}.{k}',
+                    description=f'Build something for phase {phase.pk}', order=k)
+            for phase in phase_objs
+            for k in range(1, projects + 1)
+        ], batch_size=BATCH_SIZE)
+
+        # One unusable hash shared by all users; hashing per user would dominate
+        password = make_password(None)
+        user_objs = User.objects.bulk_create([
+            User(username=f'{prefix.lower()}-user-{i}', password=password)
+            for i in range(1, users + 1)
+        ], batch_size=BATCH_SIZE)
+        topic_rows = TopicProgress.objects.bulk_create((
+            TopicProgress(user=user, topic=topic, completed=True)
+            for user in user_objs
+            for topic in topic_objs
+            if rng.random() < progress
+        ), batch_size=BATCH_SIZE)
+        project_rows = ProjectProgress.objects.bulk_create((
+            ProjectProgress(user=user, project=project, completed=True)
+            for user in user_objs
+            for project in project_objs
+            if rng.random() < progress
+        ), batch_size=BATCH_SIZE)
+        rebuild_phase_summaries([user.pk for user in user_objs])
+        edit.reindex = True
+
+    return {
+        'categories': len(category_objs),
+        'phases': len(phase_objs),
+        'topics': len(topic_objs),
+        'projects': len(project_objs),
+        'users': len(user_objs),
+        'topic_progress': len(topic_rows),
+        'project_progress': len(project_rows),
+    }
@@ -1,3 +1,1325 @@
-from django.test import TestCase
+import copy
+import gzip
+import importlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from contextlib import redirect_stdout
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.conf import settings
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import (
+    AsyncRequestFactory, Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import metrics, search
+from .cache import PageCache, bump_catalog_version, get_catalog_version, get_tree, page_cache
+from . import views
+from .analytics import cohort_report
+from .catalog import bulk_catalog_edit, sync_catalog
+from .checks import check_shared_cache
+from .loader import iter_json_array
+from .management.commands.populate_roadmap import ROADMAP
+from .progress import rebuild_phase_summaries
+from .routers import CatalogReplicaRouter
+from .querycheck import QueryCheckMiddleware, QueryCheckMixin, RepeatedQueriesError, fingerprint
+from .models import (
+    Category, Phase, Topic, Project, Resource, TopicProgress, ProjectProgress, PhaseProgressSummary,
+)
+
+
+def setUpModule():
+    # Keys are namespaced by database, but the test database is recreated
+    # under the same name each run; move past any tree an earlier run cached
+    bump_catalog_version()
+
+
+# Outside TestCase transactions catalog reads go to the replica when one is
+# configured; only ask for it then, or the runner refuses the test class
+DATABASES = {'default', 'replica'}.intersection(connections)
+
+
+def make_catalog(phases=2, topics_per_phase=3, projects_per_phase=1):
+    """Create a single-category catalog with bulk inserts"""
+    # TestCase never commits, so run the edit's on-commit invalidation directly
+    with TestCase.captureOnCommitCallbacks(execute=True), bulk_catalog_edit() as edit:
+        category = Category.objects.create(name='Test Path', code='TP', order=1)
+        phase_objs = Phase.objects.bulk_create([
+            Phase(category=category, title=f'Phase {i}', week_range=f'Phase {i}', goal='Goal', order=i)
+            for i in range(1, phases + 1)
+        ])
+        Topic.objects.bulk_create([
+            Topic(phase=phase, name=f'Topic {phase.order}.{j}', order=j)
+            for phase in phase_objs
+            for j in range(1, topics_per_phase + 1)
+        ])
+        Project.objects.bulk_create([
+            Project(phase=phase, name=f'Project {phase.order}.{j}', description='', order=j)
+            for phase in phase_objs
+            for j in range(1, projects_per_phase + 1)
+        ])
+        edit.reindex = True
+    return category
+
+
+class TopicProgressFormsetQueryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('learner', password='pw')
+        self.client.force_login(self.user)
+        self.url = reverse('roadmap:roadmap')
+
+    def count_queries(self, method='get', data=None):
+        # ?all=1 renders every topic's form in one page
+        data = {'all': 1} if data is None else data
+        page_cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(self.url, data)
+        self.assertIn(response.status_code, (200, 302))
+        return len(ctx.captured_queries)
+
+    def test_get_query_count_does_not_grow_with_topics(self):
+        make_catalog(phases=2, topics_per_phase=3)
+        small = self.count_queries()
+
+        Category.objects.all().delete()
+        make_catalog(phases=20, topics_per_phase=150)
+        self.assertEqual(Topic.objects.count(), 3000)
+        large = self.count_queries()
+
+        self.assertEqual(small, large)
+        page_cache.clear()
+        self.assertEqual(len(self.client.get(self.url, {'all': 1}).context['topic_formset']), 3000)
+
+    def post_changes(self, topics_per_phase):
+        """Untick one saved topic and tick one new topic; return the query count"""
+        Category.objects.all().delete()
+        make_catalog(phases=2, topics_per_phase=topics_per_phase)
+        topics = list(Topic.objects.order_by('order', 'pk'))
+        TopicProgress.objects.bulk_create([
+            TopicProgress(user=self.user, topic=topic, completed=True) for topic in topics[:5]
+        ])
+
+        page_cache.clear()
+        formset = self.client.get(self.url, {'all': 1}).context['topic_formset']
+        data = {
+            formset.management_form.add_prefix(name): value
+            for name, value in formset.management_form.initial.items()
+        }
+        for form in formset:
+            data[form.add_prefix('topic')] = form['topic'].value()
+            if form.instance.pk:
+                data[form.add_prefix('id')] = form.instance.pk
+            if form['completed'].value():
+                data[form.add_prefix('completed')] = 'on'
+        unticked, ticked = formset.forms[0], formset.forms[5]
+        del data[unticked.add_prefix('completed')]
+        data[ticked.add_prefix('completed')] = 'on'
+
+        queries = self.count_queries('post', data)
+        self.assertFalse(TopicProgress.objects.get(user=self.user, topic=unticked.instance.topic_id).completed)
+        self.assertTrue(TopicProgress.objects.get(user=self.user, topic=ticked.initial['topic']).completed)
+        self.assertEqual(TopicProgress.objects.filter(user=self.user).count(), 6)
+        TopicProgress.objects.all().delete()
+        return queries
+
+    def test_post_query_count_does_not_grow_with_topics(self):
+        self.assertEqual(self.post_changes(5), self.post_changes(100))
+
+
+class LazyPhaseTests(QueryCheckMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('learner', password='pw')
+        self.client.force_login(self.user)
+        self.url = reverse('roadmap:roadmap')
+        make_catalog(phases=3, topics_per_phase=4, projects_per_phase=1)
+        self.phase = Phase.objects.order_by('order').first()
+        get_tree()
+        page_cache.clear()
+
+    def test_index_renders_headers_only(self):
+        with self.assertMaxQueries(3):
+            response = self.client.get(self.url)
+        self.assertNotIn('topic_formset', response.context)
+        self.assertContains(response, 'data-phase-url=', count=3)
+        self.assertNotContains(response, 'Topic 1.1')
+
+    def test_phase_fragment_covers_one_phase(self):
+        TopicProgress.objects.create(user=self.user, topic=self.phase.topics.first(), completed=True)
+        url = reverse('roadmap:phase', args=[self.phase.pk])
+        with self.assertMaxQueries(4):
+            response = self.client.get(url)
+        self.assertContains(response, f'phase-{self.phase.pk}-TOTAL_FORMS" value="4"')
+        self.assertContains(response, 'Topic 1.1')
+        self.assertNotContains(response, 'Topic 2.1')
+        self.assertNotContains(response, '<html')
+
+    def test_phase_post_saves_only_that_phase(self):
+        url = reverse('roadmap:phase', args=[self.phase.pk])
+        formset = self.client.get(url).context['topic_formset']
+        data = {
+            formset.management_form.add_prefix(name): value
+            for name, value in formset.management_form.initial.items()
+        }
+        for form in formset:
+            data[form.add_prefix('topic')] = form['topic'].value()
+        data[formset.forms[0].add_prefix('completed')] = 'on'
+        self.assertRedirects(self.client.post(url, data), self.url, fetch_redirect_response=False)
+        self.assertEqual(list(TopicProgress.objects.values_list('topic__phase', 'completed')),
+                         [(self.phase.pk, True)])
+        self.assertEqual(PhaseProgressSummary.objects.get(user=self.user, phase=self.phase).topics_done, 1)
+
+    def test_unknown_phase_is_404(self):
+        self.assertEqual(self.client.get(reverse('roadmap:phase', args=[999999])).status_code, 404)
+
+    def test_only_anonymous_pages_use_the_local_checklist(self):
+        static_root = '<div class="card" data-static>'
+        self.assertNotContains(self.client.get(self.url), static_root)
+        self.assertNotContains(self.client.get(self.url, {'all': '1'}), static_root)
+        self.client.logout()
+        self.assertContains(self.client.get(self.url), static_root)
+
+
+class QueryBudgetTests(QueryCheckMixin, TestCase):
+    """Query budgets for the progress views, with many saved progress rows"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('learner', password='pw')
+        self.client.force_login(self.user)
+        self.url = reverse('roadmap:roadmap')
+        make_catalog(phases=4, topics_per_phase=20, projects_per_phase=3)
+        TopicProgress.objects.bulk_create([
+            TopicProgress(user=self.user, topic=topic, completed=i % 2 == 0)
+            for i, topic in enumerate(Topic.objects.all())
+        ])
+        get_tree()
+        page_cache.clear()
+
+    def test_roadmap_get(self):
+        with self.assertMaxQueries(5), self.assertNoRepeatedQueries():
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_roadmap_post(self):
+        formset = self.client.get(self.url, {'all': 1}).context['topic_formset']
+        data = {
+            formset.management_form.add_prefix(name): value
+            for name, value in formset.management_form.initial.items()
+        }
+        for form in formset:
+            data[form.add_prefix('topic')] = form['topic'].value()
+            data[form.add_prefix('id')] = form.instance.pk
+            if not form['completed'].value():  # flip every row
+                data[form.add_prefix('completed')] = 'on'
+        with self.assertMaxQueries(9), self.assertNoRepeatedQueries(threshold=3):
+            self.assertEqual(self.client.post(self.url, data).status_code, 302)
+        self.assertEqual(TopicProgress.objects.filter(completed=True).count(), 40)
+
+    def test_toggle_project(self):
+        project = Project.objects.first()
+        # Session and user lookups, the toggle, the phase lookup and the
+        # summary recount (two counts and an upsert)
+        with self.assertMaxQueries(9), self.assertNoRepeatedQueries(threshold=3):
+            self.client.post(reverse('roadmap:toggle_project'), {'project_id': project.pk})
+
+    def test_repeated_shapes_are_detected(self):
+        self.assertEqual(fingerprint("SELECT * FROM t WHERE id = 1 AND name = 'a'"),
+                         fingerprint("SELECT  * FROM t WHERE id = 22 AND name = 'b''c'"))
+        with self.assertRaises(AssertionError) as cm:
+            with self.assertNoRepeatedQueries(threshold=3):
+                for topic in TopicProgress.objects.filter(user=self.user)[:3]:
+                    topic.topic.name
+        self.assertIn('3x SELECT', str(cm.exception))
+        self.assertIn('tests.py', str(cm.exception))
+
+    @override_settings(ROADMAP_QUERYCHECK='raise', ROADMAP_QUERYCHECK_THRESHOLD=1)
+    def test_middleware_raises_in_raise_mode(self):
+        with self.assertRaises(RepeatedQueriesError):
+            self.client.get(self.url)
+
+    @override_settings(ROADMAP_QUERYCHECK='raise', ROADMAP_QUERYCHECK_THRESHOLD=3)
+    async def test_async_middleware_sees_queries_from_worker_threads(self):
+        def count_phases():
+            for _ in range(3):
+                Phase.objects.filter(pk=1).exists()
+            return HttpResponse()
+
+        async def view(request):
+            return await sync_to_async(count_phases)()
+
+        middleware = QueryCheckMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        with self.assertRaises(RepeatedQueriesError):
+            await middleware(AsyncRequestFactory().get('/'))
+
+
+class SaveProgressViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('learner', password='pw')
+        self.client.force_login(self.user)
+        self.url = reverse('roadmap:save_progress')
+        make_catalog(phases=2, topics_per_phase=50, projects_per_phase=2)
+
+    def post(self, payload):
+        return self.client.post(self.url, json.dumps(payload), content_type='application/json')
+
+    def test_upserts_only_changed_rows(self):
+        topics = list(Topic.objects.values_list('pk', flat=True)[:3])
+        project = Project.objects.values_list('pk', flat=True).first()
+        TopicProgress.objects.create(user=self.user, topic_id=topics[0], completed=True)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post({
+                'topics': [{'id': topics[0], 'completed': False}] +
+                          [{'id': pk, 'completed': True} for pk in topics[1:]],
+                'projects': [{'id': project, 'completed': True}],
+            })
+        self.assertEqual(response.json(), {'status': 'success', 'topics': 3, 'projects': 1})
+        # One upsert per progress model plus one for the phase summaries
+        writes = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(writes), 3)
+
+        progress = dict(TopicProgress.objects.filter(user=self.user).values_list('topic_id', 'completed'))
+        self.assertEqual(progress, {topics[0]: False, topics[1]: True, topics[2]: True})
+        self.assertTrue(ProjectProgress.objects.get(user=self.user, project_id=project).completed)
+
+    def test_unknown_ids_are_rejected(self):
+        response = self.post({'topics': [{'id': 999999, 'completed': True}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(TopicProgress.objects.exists())
+
+    def test_get_is_rejected(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+
+
+class ToggleProjectTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('learner', password='pw')
+        self.client.force_login(self.user)
+        make_catalog(phases=2, topics_per_phase=1, projects_per_phase=2)
+        self.projects = list(Project.objects.order_by('pk').values_list('pk', flat=True))
+
+    def batch(self, items):
+        return self.client.post(reverse('roadmap:toggle_projects'), json.dumps({'projects': items}),
+                                content_type='application/json')
+
+    def state(self):
+        return dict(ProjectProgress.objects.filter(user=self.user)
+                    .values_list('project_id', 'completed'))
+
+    def test_toggle_flips_and_sets_link(self):
+        url = reverse('roadmap:toggle_project')
+        link = 'https://github.com/learner/project'
+        response = self.client.post(url, {'project_id': self.projects[0], 'github_link': link})
+        self.assertEqual(response.json(), {'status': 'success', 'completed': True})
+        self.assertEqual(ProjectProgress.objects.get(user=self.user).github_link, link)
+        self.assertFalse(self.client.post(url, {'project_id': self.projects[0]}).json()['completed'])
+
+    def test_toggle_unknown_project_is_rejected(self):
+        response = self.client.post(reverse('roadmap:toggle_project'), {'project_id': 999999})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ProjectProgress.objects.exists())
+
+    def test_batch_toggles_and_updates_links(self):
+        first, second, third, _ = self.projects
+        ProjectProgress.objects.create(user=self.user, project_id=second, completed=True,
+                                       github_link='https://example.com/old')
+        response = self.batch([
+            {'id': first},
+            {'id': second, 'toggle': False, 'github_link': 'https://example.com/new'},
+            {'id': third}, {'id': third},  # cancels out
+        ])
+        self.assertEqual(response.json()['projects'], [
+            {'id': first, 'completed': True},
+            {'id': second, 'completed': True},
+            {'id': third, 'completed': False},
+        ])
+        self.assertEqual(self.state(), {first: True, second: True, third: False})
+        self.assertEqual(ProjectProgress.objects.get(project_id=second).github_link,
+                         'https://example.com/new')
+        self.assertEqual(sum(PhaseProgressSummary.objects.values_list('projects_done', flat=True)), 2)
+
+    def test_batch_with_unknown_project_writes_nothing(self):
+        response = self.batch([{'id': self.projects[0]}, {'id': 999999}])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ProjectProgress.objects.exists())
+
+
+class SyncProgressTests(QueryCheckMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('learner', password='pw')
+        self.client.force_login(self.user)
+        self.url = reverse('roadmap:sync_progress')
+        make_catalog(phases=2, topics_per_phase=300, projects_per_phase=2)
+        self.topics = list(Topic.objects.order_by('pk').values_list('pk', flat=True))
+        self.projects = list(Project.objects.order_by('pk').values_list('pk', flat=True))
+
+    def sync(self, payload):
+        return self.client.post(self.url, json.dumps(payload), content_type='application/json')
+
+    @staticmethod
+    def ms(moment):
+        return int(moment.timestamp() * 1000)
+
+    def test_checked_json_payload_is_imported(self):
+        with self.assertMaxQueries(16), self.assertNoRepeatedQueries(threshold=4):
+            response = self.sync({'topics': self.topics, 'projects': self.projects[:1]})
+        body = response.json()
+        self.assertEqual((body['topics'], body['projects'], body['skipped']), (600, 1, 0))
+        self.assertEqual(body['checked'], {'topics': self.topics, 'projects': self.projects[:1]})
+        self.assertEqual(TopicProgress.objects.filter(user=self.user, completed=True).count(), 600)
+        self.assertEqual(sorted(PhaseProgressSummary.objects.values_list('topics_done', 'projects_done')),
+                         [(300, 0), (300, 1)])
+
+    def test_backends_without_a_batch_limit_are_chunked(self):
+        # Like PostgreSQL: bulk_batch_size returns every item
+        with mock.patch.object(connection.ops, 'bulk_batch_size', lambda fields, objs: len(objs)), \
+                mock.patch('apps.roadmap.progress.MAX_QUERY_PARAMS', 40), \
+                CaptureQueriesContext(connection) as ctx:
+            response = self.sync({'topics': self.topics[:25], 'projects': {}})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['topics'], 25)
+        upserts = [q for q in ctx.captured_queries if 'INSERT INTO "roadmap_topicprogress"' in q['sql']]
+        self.assertEqual(len(upserts), 3)
+
+    def test_last_writer_wins(self):
+        older, newer = self.topics[:2]
+        now = timezone.now()
+        TopicProgress.objects.bulk_create([
+            TopicProgress(user=self.user, topic_id=pk, completed=True) for pk in (older, newer)
+        ])
+        TopicProgress.objects.filter(topic_id=newer).update(completed_at=now - timedelta(hours=2))
+        response = self.sync({
+            'updated_at': self.ms(now - timedelta(hours=1)),
+            'topics': [
+                {'id': older, 'completed': False, 'updated_at': self.ms(now - timedelta(days=1))},
+                {'id': newer, 'completed': False},
+                self.topics[2],
+            ],
+        })
+        self.assertEqual(response.json()['topics'], 2)
+        progress = dict(TopicProgress.objects.filter(user=self.user).values_list('topic_id', 'completed'))
+        self.assertEqual(progress, {older: True, newer: False, self.topics[2]: True})
+        # The client's timestamp is kept, so a later stale sync loses
+        self.sync({'updated_at': self.ms(now - timedelta(hours=1, minutes=30)), 'topics': [newer]})
+        self.assertFalse(TopicProgress.objects.get(topic_id=newer).completed)
+
+    def test_future_timestamps_are_clamped(self):
+        future = self.ms(timezone.now() + timedelta(days=365))
+        self.sync({'updated_at': future, 'topics': [self.topics[0]]})
+        self.assertLessEqual(TopicProgress.objects.get().completed_at, timezone.now())
+
+    def test_unknown_ids_are_skipped(self):
+        body = self.sync({'topics': [self.topics[0], 999999], 'projects': [999999]}).json()
+        self.assertEqual((body['topics'], body['projects'], body['skipped']), (1, 0, 2))
+
+    def test_malformed_payload_is_rejected(self):
+        for payload in ([1, 2], {'topics': ['x']}, {'topics': [1], 'updated_at': 'yesterday'}):
+            self.assertEqual(self.sync(payload).status_code, 400)
+        self.assertFalse(TopicProgress.objects.exists())
+
+
+class ConcurrentToggleTests(TransactionTestCase):
+    """Toggles from many threads must never lose an update"""
+
+    databases = DATABASES
+
+    threads = 8
+    toggles_per_thread = 10
+
+    def test_concurrent_toggles_serialise(self):
+        user = User.objects.create_user('learner', password='pw')
+        make_catalog(phases=1, topics_per_phase=1, projects_per_phase=1)
+        project = Project.objects.get()
+        url = reverse('roadmap:toggle_project')
+        barrier = threading.Barrier(self.threads)
+        results, errors = [], []
+
+        def hammer():
+            client = Client()
+            client.force_login(user)
+            barrier.wait()
+            try:
+                for _ in range(self.toggles_per_thread):
+                    response = client.post(url, {'project_id': project.pk})
+                    results.append(response.json()['completed'])
+            except Exception as exc:  # reported below; a thread cannot fail the test itself
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=hammer) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        total = self.threads * self.toggles_per_thread
+        # Serialised toggles alternate, so each state is reported exactly half the time
+        self.assertEqual(results.count(True), total // 2)
+        self.assertEqual(results.count(False), total // 2)
+        self.assertFalse(ProjectProgress.objects.get(user=user, project=project).completed)
+        self.assertEqual(PhaseProgressSummary.objects.get(user=user).projects_done, 0)
+
+
+@override_settings(ROADMAP_REPLICA_DATABASE='replica')
+class CatalogReplicaRouterTests(SimpleTestCase):
+    router = CatalogReplicaRouter()
+
+    def test_catalog_reads_go_to_the_replica(self):
+        for model in (Category, Phase, Topic, Project, Resource, Resource.phases.through):
+            self.assertEqual(self.router.db_for_read(model), 'replica')
+
+    def test_progress_and_writes_stay_on_the_primary(self):
+        for model in (TopicProgress, ProjectProgress, PhaseProgressSummary, User):
+            self.assertIsNone(self.router.db_for_read(model))
+        for model in (Topic, TopicProgress):
+            self.assertEqual(self.router.db_for_write(model), 'default')
+
+    def test_reads_inside_a_transaction_use_the_primary(self):
+        with mock.patch.object(connection, 'in_atomic_block', True):
+            self.assertEqual(self.router.db_for_read(Topic), 'default')
+
+    def test_related_reads_follow_the_instance(self):
+        phase = Phase(pk=1)
+        phase._state.db = 'default'
+        self.assertEqual(self.router.db_for_read(Topic, instance=phase), 'default')
+
+    @override_settings(ROADMAP_REPLICA_DATABASE=None)
+    def test_without_a_replica_nothing_is_routed(self):
+        self.assertIsNone(self.router.db_for_read(Topic))
+
+
+@skipUnless('replica' in connections, 'set DATABASE_REPLICA_URL to run against a replica')
+class ReplicaReadTests(TransactionTestCase):
+    databases = DATABASES
+
+    def test_catalog_reads_use_the_replica(self):
+        make_catalog()
+        with CaptureQueriesContext(connections['replica']) as replica:
+            Topic.objects.count()
+        self.assertEqual(len(replica.captured_queries), 1)
+
+    def test_tree_is_built_from_the_primary(self):
+        # A lagging replica would otherwise pin a stale tree under the new version
+        make_catalog()
+        with CaptureQueriesContext(connections['replica']) as replica, \
+                CaptureQueriesContext(connection) as primary:
+            get_tree()
+        self.assertEqual(replica.captured_queries, [])
+        self.assertTrue([q for q in primary.captured_queries if 'roadmap_topic' in q['sql']])
+
+
+class SqliteSettingsTests(TestCase):
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite pragmas')
+    def test_file_databases_use_wal_and_a_busy_timeout(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.DATABASES['default']['OPTIONS']['timeout'] * 1000)
+
+
+class SearchTests(QueryCheckMixin, TestCase):
+    def setUp(self):
+        make_catalog(phases=2, topics_per_phase=2, projects_per_phase=1)
+        self.phase = Phase.objects.get(order=2)
+        self.topic = Topic.objects.create(phase=self.phase, name='Gradient descent and backpropagation')
+        self.project = Project.objects.create(phase=self.phase, name='Tiny autograd',
+                                              description='Implement backpropagation on scalars')
+        self.resource = Resource.objects.create(title='Deep Learning', resource_type='BOOK',
+                                                description='Chapter six covers backpropagation')
+        self.resource.phases.add(*Phase.objects.all())
+
+    def search(self, **params):
+        response = self.client.get(reverse('roadmap:search'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_results_are_ranked_with_paths(self):
+        results = self.search(q='backprop')
+        self.assertEqual([(r['kind'], r['id']) for r in results][:1], [('topic', self.topic.pk)])
+        self.assertEqual({(r['kind'], r['id']) for r in results},
+                         {('topic', self.topic.pk), ('project', self.project.pk),
+                          ('resource', self.resource.pk)})
+        self.assertEqual(results[0]['path'], [{
+            'category': 'TP', 'category_name': 'Test Path', 'phase_id': self.phase.pk,
+            'phase_order': 2, 'phase': 'Phase 2',
+        }])
+        resource = next(r for r in results if r['kind'] == 'resource')
+        self.assertEqual(len(resource['path']), 2)
+
+    def test_every_term_must_match(self):
+        self.assertEqual([r['id'] for r in self.search(q='backprop scalars')], [self.project.pk])
+        self.assertEqual(self.search(q='backprop kubernetes'), [])
+        self.assertEqual(self.search(q='  '), [])
+
+    def test_kind_filter_and_bad_parameters(self):
+        self.assertEqual([r['kind'] for r in self.search(q='backprop', kind='project')], ['project'])
+        url = reverse('roadmap:search')
+        self.assertEqual(self.client.get(url, {'q': 'x', 'kind': 'user'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'q': 'x', 'limit': 'all'}).status_code, 400)
+
+    def test_index_follows_edits(self):
+        self.topic.name = 'Convolutions'
+        self.topic.save()
+        self.assertEqual([r['id'] for r in self.search(q='convol')], [self.topic.pk])
+        self.project.delete()
+        self.assertEqual({r['kind'] for r in self.search(q='backprop')}, {'resource'})
+
+    def test_bulk_catalog_sync_rebuilds_the_index(self):
+        sync_catalog([{'code': 'QX', 'name': 'Quantum', 'phases': [
+            {'title': 'Qubits', 'week_range': 'Weeks 1-2', 'goal': 'Superposition basics',
+             'topics': ['Bloch sphere'], 'projects': []},
+        ]}])
+        results = self.search(q='bloch')
+        self.assertEqual([r['path'][0]['category'] for r in results], ['QX'])
+
+    def test_bulk_delete_rebuilds_the_index_once(self):
+        if search.backend() != 'fts5':
+            self.skipTest('only the FTS5 index is written row by row')
+        with CaptureQueriesContext(connection) as ctx, bulk_catalog_edit():
+            self.phase.delete()
+        writes = [q['sql'] for q in ctx.captured_queries if 'roadmap_search' in q['sql']]
+        self.assertTrue(writes)
+        # One rebuild instead of a delete per removed topic, project and phase
+        self.assertFalse([sql for sql in writes if 'WHERE rowid' in sql])
+        self.assertEqual([r['kind'] for r in self.search(q='backprop')], ['resource'])
+
+    def test_definition_file_load_rebuilds_the_index(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / 'defs.jsonl'
+        path.write_text('\n'.join(json.dumps(record) for record in [
+            {'code': 'ZO', 'name': 'Zoology', 'order': 5},
+            {'category': 'ZO', 'order': 1, 'title': 'Marsupials', 'goal': 'Pouches',
+             'topics': ['Wombat burrows'], 'projects': []},
+        ]), encoding='utf-8')
+        call_command('populate_roadmap', str(path), stdout=StringIO())
+        results = self.search(q='wombat')
+        self.assertEqual([(r['kind'], r['path'][0]['category']) for r in results], [('topic', 'ZO')])
+
+    def test_one_query_once_the_tree_is_cached(self):
+        self.search(q='backprop')
+        with self.assertMaxQueries(1):
+            self.search(q='gradient')
+
+    @override_settings(ROADMAP_SEARCH_BACKEND='memory')
+    def test_memory_backend_agrees(self):
+        results = self.search(q='backprop')
+        self.assertEqual(results[0]['id'], self.topic.pk)
+        self.assertEqual(len(results), 3)
+        self.assertEqual([r['id'] for r in self.search(q='backprop scalars')], [self.project.pk])
+
+
+class TreeApiTests(QueryCheckMixin, TestCase):
+    def setUp(self):
+        make_catalog(phases=2, topics_per_phase=2, projects_per_phase=1)
+        self.url = reverse('roadmap:api_tree')
+
+    def fetch(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_full_tree(self):
+        data = self.fetch()
+        [category] = data['categories']
+        self.assertEqual(category['code'], 'TP')
+        self.assertEqual([phase['order'] for phase in category['phases']], [1, 2])
+        phase = category['phases'][0]
+        self.assertEqual(set(phase), {'id', 'category_id', 'title', 'week_range', 'goal', 'order',
+                                      'topics', 'projects', 'resources'})
+        self.assertEqual(phase['topics'][0], {'id': phase['topics'][0]['id'], 'name': 'Topic 1.1', 'order': 1})
+
+    def test_sparse_fields_and_includes(self):
+        data = self.fetch(**{'fields[category]': 'code', 'fields[phase]': 'order',
+                             'fields[topic]': 'name', 'include': 'topics'})
+        self.assertEqual(data, {'categories': [{'code': 'TP', 'phases': [
+            {'order': 1, 'topics': [{'name': 'Topic 1.1'}, {'name': 'Topic 1.2'}]},
+            {'order': 2, 'topics': [{'name': 'Topic 2.1'}, {'name': 'Topic 2.2'}]},
+        ]}]})
+        self.assertEqual(self.fetch(include='')['categories'][0].get('phases'), None)
+
+    def test_category_filter(self):
+        self.assertEqual(self.fetch(category='XX'), {'categories': []})
+        self.assertEqual(len(self.fetch(category='TP')['categories']), 1)
+
+    def test_progress_is_embedded_for_the_signed_in_user(self):
+        user = User.objects.create_user('learner', password='pw')
+        topic = Topic.objects.get(name='Topic 2.1')
+        TopicProgress.objects.create(user=user, topic=topic, completed=True)
+        self.assertEqual(self.client.get(self.url, {'progress': 1}).status_code, 403)
+
+        self.client.force_login(user)
+        data = self.fetch(progress=1, include='topics', **{'fields[topic]': 'id,completed'})
+        done = [t['id'] for phase in data['categories'][0]['phases'] for t in phase['topics'] if t['completed']]
+        self.assertEqual(done, [topic.pk])
+
+    def test_unknown_fields_are_rejected(self):
+        for params in ({'fields[topic]': 'secret'}, {'fields[user]': 'id'}, {'include': 'users'},
+                       {'fields[topic]': 'completed'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+    def test_cached_tree_needs_no_queries(self):
+        self.fetch()
+        with self.assertMaxQueries(0):
+            self.fetch()
+
+
+class PhaseProgressSummaryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('learner', password='pw')
+        self.client.force_login(self.user)
+        make_catalog(phases=2, topics_per_phase=4, projects_per_phase=2)
+        self.phases = list(Phase.objects.order_by('order'))
+
+    def summaries(self):
+        return {
+            s.phase_id: (s.topics_done, s.projects_done)
+            for s in PhaseProgressSummary.objects.filter(user=self.user)
+        }
+
+    def test_writes_keep_summaries_in_step(self):
+        first, second = self.phases
+        topics = list(first.topics.values_list('pk', flat=True))
+        project = second.projects.values_list('pk', flat=True).first()
+        self.client.post(reverse('roadmap:save_progress'), json.dumps({
+            'topics': [{'id': pk, 'completed': True} for pk in topics[:3]],
+        }), content_type='application/json')
+        self.assertEqual(self.summaries(), {first.pk: (3, 0)})
+
+        toggle = reverse('roadmap:toggle_project')
+        self.client.post(toggle, {'project_id': project})
+        self.assertEqual(self.summaries(), {first.pk: (3, 0), second.pk: (0, 1)})
+        self.client.post(toggle, {'project_id': project})
+        self.assertEqual(self.summaries(), {first.pk: (3, 0), second.pk: (0, 0)})
+        self.client.post(toggle, {'project_id': project})
+        self.assertEqual(self.summaries(), {first.pk: (3, 0), second.pk: (0, 1)})
+
+        self.client.post(reverse('roadmap:save_progress'), json.dumps({
+            'topics': [{'id': topics[0], 'completed': False}],
+        }), content_type='application/json')
+        self.assertEqual(self.summaries()[first.pk], (2, 0))
+
+        page_cache.clear()
+        self.assertContains(self.client.get(reverse('roadmap:roadmap')), '2/4 topics')
+
+    def complete_topics(self, ids):
+        self.client.post(reverse('roadmap:save_progress'), json.dumps({
+            'topics': [{'id': pk, 'completed': True} for pk in ids],
+        }), content_type='application/json')
+
+    def test_catalog_pruning_recounts_summaries(self):
+        first = self.phases[0]
+        self.complete_topics(first.topics.values_list('pk', flat=True)[:3])
+        self.assertEqual(self.summaries(), {first.pk: (3, 0)})
+        with CaptureQueriesContext(connection) as ctx:
+            sync_catalog([{'code': 'TP', 'name': 'Test Path', 'order': 1, 'phases': [
+                {'order': 1, 'title': 'Phase 1', 'week_range': 'Phase 1', 'goal': 'Goal',
+                 'topics': ['Topic 1.1']},
+            ]}])
+        self.assertEqual(self.summaries(), {first.pk: (1, 0)})
+        # One recount for all pruned topics, not one per topic
+        recounts = [q for q in ctx.captured_queries
+                    if q['sql'].startswith('SELECT') and 'FROM "roadmap_phaseprogresssummary"' in q['sql']]
+        self.assertEqual(len(recounts), 1)
+
+    def test_admin_edits_recount_summaries(self):
+        first, second = self.phases
+        topic, other = first.topics.order_by('order')[:2]
+        progress = TopicProgress.objects.create(user=self.user, topic=topic, completed=True)
+        TopicProgress.objects.create(user=self.user, topic=other, completed=True)
+        self.assertEqual(self.summaries(), {first.pk: (2, 0)})
+
+        progress.delete()
+        self.assertEqual(self.summaries(), {first.pk: (1, 0)})
+
+        other.phase = second
+        other.save()
+        self.assertEqual(self.summaries(), {first.pk: (0, 0), second.pk: (1, 0)})
+
+        other.delete()
+        self.assertEqual(self.summaries(), {first.pk: (0, 0), second.pk: (0, 0)})
+
+    def test_migration_backfills_existing_progress(self):
+        migration = importlib.import_module('apps.roadmap.migrations.0005_backfill_phase_progress_summary')
+        first, second = self.phases
+        TopicProgress.objects.bulk_create([
+            TopicProgress(user=self.user, topic=topic, completed=True) for topic in first.topics.all()[:2]
+        ])
+        ProjectProgress.objects.bulk_create([
+            ProjectProgress(user=self.user, project=project, completed=i == 0)
+            for i, project in enumerate(second.projects.all())
+        ])
+        PhaseProgressSummary.objects.create(user=self.user, phase=first, topics_done=9)
+        migration.backfill_summaries(None, connection.schema_editor())
+        self.assertEqual(self.summaries(), {first.pk: (2, 0), second.pk: (0, 1)})
+
+    def test_rebuild_command_recounts_from_progress(self):
+        topics = Topic.objects.filter(phase=self.phases[1])
+        TopicProgress.objects.bulk_create([
+            TopicProgress(user=self.user, topic=topic, completed=i % 2 == 0)
+            for i, topic in enumerate(topics)
+        ])
+        PhaseProgressSummary.objects.create(user=self.user, phase=self.phases[0], topics_done=9)
+
+        out = StringIO()
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('rebuild_progress_summary', stdout=out)
+        self.assertIn('Rebuilt 1 phase summaries', out.getvalue())
+        self.assertEqual(self.summaries(), {self.phases[1].pk: (2, 0)})
+        # Grouped counts, not one query per user or phase
+        self.assertLessEqual(len(ctx.captured_queries), 8)
+
+    def test_rebuild_rejects_unknown_users(self):
+        with self.assertRaises(CommandError):
+            call_command('rebuild_progress_summary', '--user', 'nobody', stdout=StringIO())
+
+
+class CohortAnalyticsTests(TestCase):
+    def setUp(self):
+        make_catalog(phases=2, topics_per_phase=2, projects_per_phase=1)
+        self.phases = list(Phase.objects.order_by('order'))
+        self.topics = [list(phase.topics.order_by('order')) for phase in self.phases]
+
+    def complete(self, user, topics, hours):
+        """Mark ``topics`` done ``hours[i]`` hours after a fixed start"""
+        start = timezone.now() - timedelta(days=30)
+        for topic, offset in zip(topics, hours):
+            progress = TopicProgress.objects.create(user=user, topic=topic, completed=True)
+            TopicProgress.objects.filter(pk=progress.pk).update(completed_at=start + timedelta(hours=offset))
+
+    def add_learners(self):
+        a, b, c = (User.objects.create_user(name) for name in 'abc')
+        self.complete(a, self.topics[0], [0, 24])
+        self.complete(b, self.topics[0], [0, 72])
+        self.complete(c, self.topics[0][:1], [0])
+        self.complete(a, self.topics[1][:1], [0])
+        rebuild_phase_summaries()
+
+    def test_report(self):
+        self.add_learners()
+        report = cohort_report()
+        self.assertEqual(report['learners'], 3)
+        first, second = report['phases']
+        self.assertEqual((first['started'], first['completed']), (3, 2))
+        self.assertEqual(first['median_days'], 2.0)
+        self.assertEqual(first['drop_off'], round(2 / 3, 4))
+        self.assertEqual((second['started'], second['completed'], second['median_days']), (1, 0, None))
+        rates = {t['topic_id']: t['rate'] for t in report['topics']}
+        self.assertEqual(rates[self.topics[0][0].pk], 1.0)
+        self.assertEqual(rates[self.topics[1][1].pk], 0.0)
+
+    def test_query_count_does_not_grow_with_users(self):
+        self.add_learners()
+        get_tree()
+        with CaptureQueriesContext(connection) as small:
+            cohort_report()
+        for i in range(20):
+            self.complete(User.objects.create_user(f'extra{i}'), self.topics[0], [0, i])
+        rebuild_phase_summaries()
+        with CaptureQueriesContext(connection) as large:
+            cohort_report()
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_view_is_staff_only(self):
+        url = reverse('roadmap:analytics')
+        self.client.force_login(User.objects.create_user('learner'))
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+        self.assertEqual(self.client.get(url, {'format': 'json'}).json()['learners'], 0)
+        self.assertContains(self.client.get(url), 'Cohort Analytics')
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        make_catalog()
+        metrics.clear_metrics()
+
+    def scrape(self):
+        # The test client's address stands in for the Prometheus scraper
+        with self.settings(ROADMAP_METRICS_ALLOWED_IPS=['127.0.0.1']):
+            response = self.client.get('/metrics')
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        return response.content.decode()
+
+    def test_metrics_are_staff_or_allowlist_only(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(User.objects.create_user('learner'))
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.logout()
+        with self.settings(ROADMAP_METRICS_ALLOWED_IPS=['10.0.0.9']):
+            self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.9').status_code, 200)
+
+    def test_roadmap_request_is_recorded(self):
+        self.client.force_login(User.objects.create_user('learner'))
+        page_cache.clear()
+        self.client.get(reverse('roadmap:roadmap'), {'all': 1})
+        text = self.scrape()
+        self.assertIn('roadmap_requests_total{view="roadmap:roadmap"} 1', text)
+        self.assertIn('roadmap_request_duration_seconds_count{view="roadmap:roadmap"} 1', text)
+        self.assertIn('roadmap_request_sql_queries_bucket{view="roadmap:roadmap",le="+Inf"} 1', text)
+        for name in ('formset', 'template'):
+            self.assertIn(
+                f'roadmap_request_stage_duration_seconds_count{{view="roadmap:roadmap",stage="{name}"}} 1', text)
+
+    async def test_async_requests_are_measured(self):
+        async def view(request):
+            await sync_to_async(Category.objects.count)()
+            return HttpResponse()
+
+        middleware = metrics.MetricsMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        await middleware(AsyncRequestFactory().get('/'))
+        self.assertIn('roadmap_request_sql_queries_sum{view="unresolved"} 1', metrics.render_metrics())
+
+    @override_settings(ROADMAP_METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_only_counted(self):
+        self.client.get(reverse('roadmap:roadmap'))
+        text = self.scrape()
+        self.assertIn('roadmap_requests_total{view="roadmap:roadmap"} 1', text)
+        self.assertIn('roadmap_metrics_sample_rate 0.0', text)
+        self.assertNotIn('roadmap_request_duration_seconds_count', text)
+
+    def test_page_cache_counters_are_exported(self):
+        self.client.force_login(User.objects.create_user('learner'))
+        page_cache.clear()
+        for _ in range(3):
+            self.client.get(reverse('roadmap:roadmap'))
+        stats = page_cache.stats()
+        text = self.scrape()
+        self.assertIn(f'roadmap_page_cache_hits_total {stats["hits"]}', text)
+        self.assertIn(f'roadmap_page_cache_misses_total {stats["misses"]}', text)
+        self.assertIn('roadmap_page_cache_entries 1', text)
+        self.assertIn(f'roadmap_page_cache_bytes {stats["bytes"]}', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = metrics.Histogram('h', 'test', ['view'], buckets=(1, 5))
+        for value in (0.5, 3, 3, 9):
+            histogram.observe(value, 'v')
+        self.assertEqual(histogram.render()[2:], [
+            'h_bucket{view="v",le="1.0"} 1',
+            'h_bucket{view="v",le="5.0"} 3',
+            'h_bucket{view="v",le="+Inf"} 4',
+            'h_sum{view="v"} 15.5',
+            'h_count{view="v"} 4',
+        ])
+
+
+class CatalogTreeCacheTests(TestCase):
+    def setUp(self):
+        make_catalog(phases=3, topics_per_phase=4, projects_per_phase=2)
+        self.url = reverse('roadmap:roadmap')
+
+    def test_anonymous_views_need_no_catalog_queries(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Topic 3.4')
+
+    def test_catalog_edits_invalidate_the_tree(self):
+        get_tree()
+        topic = Topic.objects.get(name='Topic 1.1')
+        topic.name = 'Renamed topic'
+        topic.save()
+        self.assertContains(self.client.get(self.url), 'Renamed topic')
+
+        Phase.objects.get(order=2).delete()
+        tree = get_tree()
+        self.assertEqual([phase.order for phase in tree[0].phases], [1, 3])
+
+    def test_tree_is_immutable(self):
+        tree = get_tree()
+        self.assertIsInstance(tree, tuple)
+        with self.assertRaises(AttributeError):
+            tree[0].phases[0].topics[0].name = 'changed'
+
+    def test_versions_are_kept_per_database(self):
+        version = get_catalog_version()
+        with mock.patch.dict(connection.settings_dict, {'NAME': str(settings.BASE_DIR / 'other.sqlite3')}):
+            other = bump_catalog_version()
+            self.assertEqual(get_catalog_version(), other)
+        self.assertEqual(get_catalog_version(), version)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'the second process reaches the test database by file name')
+class CrossProcessCacheTests(TransactionTestCase):
+    """A catalog edit in another process must reach this process's tree"""
+
+    databases = DATABASES
+
+    def test_edit_in_another_process_invalidates_the_tree(self):
+        make_catalog(phases=1, topics_per_phase=1)
+        get_tree()
+        script = (
+            'import django; django.setup(); '
+            'from apps.roadmap.models import Phase, Topic; '
+            'Topic.objects.create(phase=Phase.objects.get(), name="Added elsewhere", order=9)'
+        )
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': 'personal_website.settings',
+            'DATABASE_URL': f"sqlite:///{connection.settings_dict['NAME']}",
+            'DATABASE_REPLICA_URL': '',
+        }
+        subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env, check=True)
+        names = [topic.name for topic in get_tree()[0].phases[0].topics]
+        self.assertIn('Added elsewhere', names)
+
+
+class CacheCheckTests(SimpleTestCase):
+    def test_process_local_cache_is_flagged(self):
+        local = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=local):
+            self.assertEqual([w.id for w in check_shared_cache(None)], ['roadmap.W001'])
+        self.assertEqual(check_shared_cache(None), [])
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        make_catalog(phases=2, topics_per_phase=3)
+        self.user = User.objects.create_user('learner', password='pw')
+        self.client.force_login(self.user)
+        self.url = reverse('roadmap:roadmap')
+        page_cache.clear()
+
+    def test_repeat_visit_is_served_from_cache(self):
+        # the first visit sets the CSRF cookie, the second fills the cache
+        self.client.get(self.url)
+        self.client.get(self.url)
+        hits = page_cache.hits
+        # only the session and user lookups remain
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(page_cache.hits, hits + 1)
+        self.assertContains(response, 'Phase 1')
+
+    def test_progress_change_invalidates_page(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        topic = Topic.objects.first()
+        TopicProgress.objects.create(user=self.user, topic=topic, completed=True)
+        misses = page_cache.misses
+        self.client.get(self.url)
+        self.assertEqual(page_cache.misses, misses + 1)
+
+    def test_lru_eviction_respects_memory_cap(self):
+        cache = PageCache(max_bytes=10)
+        cache.set(1, 'a', b'aaaa')
+        cache.set(2, 'a', b'bbbb')
+        self.assertEqual(cache.get(1, 'a'), b'aaaa')
+        cache.set(3, 'a', b'cccc')
+        self.assertIsNone(cache.get(2, 'a'))
+        self.assertEqual(cache.get(1, 'a'), b'aaaa')
+        self.assertIsNone(cache.get(1, 'b'))
+        self.assertEqual(cache.stats()['bytes'], 8)
+        self.assertEqual(cache.evictions, 1)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        make_catalog(phases=2, topics_per_phase=3)
+        self.url = reverse('roadmap:roadmap')
+        get_tree()
+        page_cache.clear()
+
+    def test_anonymous_validator_is_shared_and_public(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertIn('public', response['Cache-Control'])
+        self.assertEqual(self.client.get(self.url)['ETag'], etag)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        Topic.objects.create(phase=Phase.objects.first(), name='New topic', order=99)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_signed_in_validator_follows_progress(self):
+        user = User.objects.create_user('learner', password='pw')
+        self.client.force_login(user)
+        self.client.get(self.url)  # sets the CSRF cookie
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertIn('private', response['Cache-Control'])
+        # only the session and user lookups run
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(self.client.get(self.url, {'all': 1})['ETag'], etag)
+
+        TopicProgress.objects.create(user=user, topic=Topic.objects.first(), completed=True)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    async def test_async_view_answers_304(self):
+        request = AsyncRequestFactory().get('/roadmap/')
+        request.user = AnonymousUser()
+        etag = (await views.aroadmap_view(request))['ETag']
+        request = AsyncRequestFactory().get('/roadmap/', headers={'If-None-Match': etag})
+        request.user = AnonymousUser()
+        self.assertEqual((await views.aroadmap_view(request)).status_code, 304)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        make_catalog(phases=2, topics_per_phase=3, projects_per_phase=2)
+        self.user = User.objects.create_user('learner', password='pw')
+        self.factory = AsyncRequestFactory()
+        page_cache.clear()
+
+    async def test_anonymous_page_matches_sync_view(self):
+        request = self.factory.get('/roadmap/')
+        request.user = AnonymousUser()
+        response = await views.aroadmap_view(request)
+        sync_request = RequestFactory().get('/roadmap/')
+        sync_request.user = AnonymousUser()
+        self.assertEqual(response.content, views.roadmap_view(sync_request).content)
+
+    async def test_signed_in_page_has_formset(self):
+        topic = await Topic.objects.afirst()
+        await TopicProgress.objects.acreate(user=self.user, topic=topic, completed=True)
+        request = self.factory.get('/roadmap/', {'all': 1})
+        request.user = self.user
+        response = await views.aroadmap_view(request)
+        self.assertContains(response, 'form-TOTAL_FORMS" value="6"')
+        self.assertContains(response, 'checked')
+
+    async def test_toggle_project(self):
+        project = await Project.objects.afirst()
+        request = self.factory.post('/roadmap/toggle-project/', {'project_id': project.pk})
+        request.user = self.user
+        response = await views.atoggle_project_progress(request)
+        self.assertEqual(json.loads(response.content), {'status': 'success', 'completed': True})
+        response = await views.atoggle_project_progress(request)
+        self.assertEqual(json.loads(response.content), {'status': 'success', 'completed': False})
+
+    async def test_toggle_requires_login(self):
+        request = self.factory.post('/roadmap/toggle-project/', {'project_id': 1})
+        request.user = AnonymousUser()
+        response = await views.atoggle_project_progress(request)
+        self.assertEqual(response.status_code, 302)
+
+
+class PopulateRoadmapTests(TestCase):
+    def test_rerun_is_a_no_op_that_keeps_progress(self):
+        call_command('populate_roadmap', stdout=StringIO())
+        user = User.objects.create_user('learner', password='pw')
+        topic = Topic.objects.first()
+        TopicProgress.objects.create(user=user, topic=topic, completed=True)
+
+        with CaptureQueriesContext(connection) as ctx:
+            stats = sync_catalog(ROADMAP)
+        self.assertTrue(all(not any(counts.values()) for counts in stats.values()))
+        self.assertLessEqual(len(ctx.captured_queries), 8)
+        self.assertTrue(TopicProgress.objects.get(user=user, topic=topic).completed)
+
+    def test_sync_applies_only_changes(self):
+        sync_catalog(ROADMAP)
+        roadmap = copy.deepcopy(ROADMAP)
+        kept = Topic.objects.get(phase__category__code='AI', phase__order=1, order=1)
+        roadmap[0]['phases'][0]['topics'][1] = 'Renamed topic'
+        roadmap[0]['phases'][0]['topics'].append('New topic')
+        del roadmap[1]['phases'][-1]
+
+        stats = sync_catalog(roadmap)
+        self.assertEqual(stats['topics'], {'created': 1, 'updated': 1, 'deleted': 0})
+        self.assertEqual(stats['phases']['deleted'], 1)
+        self.assertFalse(Phase.objects.filter(category__code='QC', order=4).exists())
+        self.assertTrue(Topic.objects.filter(pk=kept.pk).exists())
+        self.assertTrue(Topic.objects.filter(name='Renamed topic').exists())
+
+
+class SyntheticCatalogTests(TestCase):
+    def test_generate_and_clear(self):
+        call_command('populate_roadmap', stdout=StringIO())
+        real_topics = Topic.objects.count()
+        call_command('generate_synthetic_catalog', '--categories', '2', '--phases', '3', '--topics', '4',
+                     '--projects', '1', '--users', '5', '--progress', '0.5', stdout=StringIO())
+        self.assertEqual(Topic.objects.count(), real_topics + 24)
+        self.assertEqual(User.objects.filter(username__startswith='syn-').count(), 5)
+        done = TopicProgress.objects.filter(completed=True).count()
+        self.assertGreater(done, 0)
+        self.assertEqual(sum(PhaseProgressSummary.objects.values_list('topics_done', flat=True)), done)
+        self.assertEqual(len(get_tree()), len(ROADMAP) + 2)
+
+        call_command('generate_synthetic_catalog', '--clear', stdout=StringIO())
+        self.assertEqual(Topic.objects.count(), real_topics)
+        self.assertFalse(TopicProgress.objects.exists())
+
+
+class DefinitionFileLoaderTests(TestCase):
+    def write(self, name, text):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / name
+        path.write_text(text, encoding='utf-8')
+        return str(path)
+
+    def test_json_array_is_streamed_across_chunks(self):
+        records = [{'order': i, 'topics': ['x' * i]} for i in range(200)]
+        text = json.dumps(records, indent=2)
+        for chunk_size in (1, 13, 4096):
+            self.assertEqual(list(iter_json_array(StringIO(text), chunk_size)), records)
+
+    def test_jsonl_file_loads_in_batches(self):
+        lines = [json.dumps({'code': 'BIG', 'name': 'Big', 'order': 3})]
+        lines += [
+            json.dumps({
+                'category': 'BIG', 'order': i, 'title': f'Phase {i}', 'goal': 'Goal',
+                'topics': [f'Topic {i}.{j}' for j in range(10)],
+                'projects': [{'name': f'Project {i}', 'description': ''}],
+            })
+            for i in range(1, 26)
+        ]
+        path = self.write('big.jsonl', '\n'.join(lines))
+
+        out = StringIO()
+        call_command('populate_roadmap', path, '--batch-size', '10', stdout=out)
+        self.assertIn('Loaded 300 rows', out.getvalue())
+        self.assertEqual(Topic.objects.filter(phase__category__code='BIG').count(), 250)
+
+        out = StringIO()
+        call_command('populate_roadmap', path, stdout=out)
+        self.assertIn('topics: 0 created, 0 updated, 0 deleted', out.getvalue())
+
+    def test_unknown_category_is_an_error(self):
+        path = self.write('bad.json', json.dumps([{'category': 'NOPE', 'order': 1, 'title': 'x'}]))
+        with self.assertRaises(CommandError):
+            call_command('populate_roadmap', path, stdout=StringIO())
+
+
+class ExplainRoadmapTests(TestCase):
+    def test_roadmap_queries_avoid_full_table_scans(self):
+        make_catalog()
+        User.objects.create_user('learner', password='pw')
+        out = StringIO()
+        call_command('explain_roadmap', '--user', 'learner', '--fail-on-scan', stdout=out)
+        # Queries of the index page, the ?all=1 page and a phase fragment
+        plans = out.getvalue()
+        for table in ('roadmap_phaseprogresssummary', 'roadmap_topicprogress', 'roadmap_projectprogress'):
+            self.assertIn(f'FROM "{table}"', plans)
+        self.assertIn('"roadmap_topic"."phase_id" = ', plans)
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite query plans')
+    def test_tree_queries_are_sorted_by_their_indexes(self):
+        make_catalog()
+        User.objects.create_user('learner', password='pw')
+        out = StringIO()
+        call_command('explain_roadmap', '--user', 'learner', stdout=out)
+        plans = out.getvalue()
+        self.assertNotIn('TEMP B-TREE', plans)
+        for index in ('roadmap_phase_category_order', 'roadmap_topic_phase_order', 'roadmap_project_phase_order'):
+            self.assertIn(f'USING INDEX {index}', plans)
+
+
+def import_tool(name):
+    """Import a script from tools/, which imports its siblings by bare name"""
+    tools = str(settings.BASE_DIR / 'tools')
+    if tools not in sys.path:
+        sys.path.insert(0, tools)
+    return importlib.import_module(name)
+
+
+class StaticBuildTests(TestCase):
+    """tools/build_static.py writing into a temporary directory"""
+
+    def setUp(self):
+        self.build_static = import_tool('build_static')
+        self.minify = import_tool('minify')
+        self.category = make_catalog(phases=2, topics_per_phase=2)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.out = Path(tmp.name)
+
+    def build(self, **options):
+        with redirect_stdout(StringIO()):
+            return self.build_static.build_static_site(output_dir=self.out, **options)
+
+    def shards(self):
+        return {path.name: path for path in (self.out / 'data').glob('*.json')}
+
+    def test_unchanged_rebuild_is_skipped(self):
+        self.assertTrue(self.build(incremental=True))
+        self.assertTrue((self.out / '.build_manifest.json').exists())
+        self.assertFalse(self.build(incremental=True))
+        # A catalog edit or a changed output file forces a rebuild
+        Topic.objects.filter(name='Topic 1.1').update(name='Renamed topic')
+        self.assertTrue(self.build(incremental=True))
+        self.assertIn('Renamed topic', (self.out / 'index.html').read_text())
+        (self.out / 'index.html').write_text('edited')
+        self.assertTrue(self.build(incremental=True))
+        self.assertFalse(self.build(incremental=True))
+
+    def test_split_writes_a_page_per_category_and_phase(self):
+        self.build(split=True, jobs=2)
+        self.assertIn('tp/', (self.out / 'index.html').read_text())
+        self.assertIn('Topic 2.1', (self.out / 'tp' / 'index.html').read_text())
+        phase_page = (self.out / 'tp' / 'phase-1' / 'index.html').read_text()
+        self.assertIn('Topic 1.2', phase_page)
+        self.assertNotIn('Topic 2.1', phase_page)
+        self.assertIn('href="../../"', phase_page)
+        # Removed phases lose their pages on the next build
+        Phase.objects.filter(order=2).delete()
+        self.build(split=True, jobs=2)
+        self.assertFalse((self.out / 'tp' / 'phase-2').exists())
+
+    def test_optimized_pages_are_minified_and_precompressed(self):
+        self.build(optimize=True)
+        page = (self.out / 'index.html').read_bytes()
+        self.assertNotIn(b'\n', page)
+        self.assertNotIn(b'<script>', page)
+        scripts = list(self.out.glob('roadmap.*.js'))
+        self.assertEqual(len(scripts), 1)
+        self.assertIn(f'src="{scripts[0].name}"'.encode(), page)
+        for name in ('index.html', scripts[0].name, 'web.css'):
+            data = (self.out / name).read_bytes()
+            self.assertEqual(gzip.decompress((self.out / f'{name}.gz').read_bytes()), data)
+            if self.minify.brotli is not None:
+                self.assertEqual(self.minify.brotli.decompress((self.out / f'{name}.br').read_bytes()), data)
+            else:
+                self.assertFalse((self.out / f'{name}.br').exists())
+
+    def test_shards_hold_each_category_under_a_content_hash(self):
+        self.build()
+        shards = self.shards()
+        self.assertEqual(len(shards), 1)
+        name, path = next(iter(shards.items()))
+        data = path.read_bytes()
+        self.assertEqual(name, f'tp.{self.build_static.sha256(data)[:12]}.json')
+        shard = json.loads(data)
+        self.assertEqual(shard['code'], 'TP')
+        self.assertEqual([phase['order'] for phase in shard['phases']], [1, 2])
+        topic_ids = list(Topic.objects.filter(phase__order=1).order_by('order').values_list('id', 'name'))
+        self.assertEqual([tuple(topic) for topic in shard['phases'][0]['topics']], topic_ids)
+
+    def test_client_render_page_loads_categories_from_shards(self):
+        self.build(client_render=True)
+        page = (self.out / 'index.html').read_text()
+        (shard,) = self.shards()
+        self.assertIn(f'data-shard="data/{shard}"', page)
+        self.assertIn('Test Path', page)
+        self.assertNotIn('Topic 1.1', page)
@@ -1,10 +1,24 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 app_name = 'roadmap'
 
+# Under ASGI the async views avoid taking a thread-pool slot per request
+if settings.ROADMAP_ASYNC_VIEWS:
+    roadmap_view, toggle_project_progress = views.aroadmap_view, views.atoggle_project_progress
+else:
+    roadmap_view, toggle_project_progress = views.roadmap_view, views.toggle_project_progress
+
 urlpatterns = [
-    path('', views.roadmap_view, name='roadmap'),
+    path('', roadmap_view, name='roadmap'),
+    path('phase/<int:phase_id>/', views.phase_view, name='phase'),
     #path('toggle-topic/', views.toggle_topic_progress, name='toggle_topic'),
-    path('toggle-project/', views.toggle_project_progress, name='toggle_project'),
+    path('toggle-project/', toggle_project_progress, name='toggle_project'),
+    path('toggle-projects/', views.toggle_projects_view, name='toggle_projects'),
+    path('save-progress/', views.save_progress_view, name='save_progress'),
+    path('sync-progress/', views.sync_progress_view, name='sync_progress'),
+    path('search/', views.search_view, name='search'),
+    path('api/tree/', views.api_tree_view, name='api_tree'),
+    path('analytics/', views.analytics_view, name='analytics'),
 ]
\ No newline at end of file
@@ -1,55 +1,69 @@
+import asyncio
+import functools
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
 from django.shortcuts import render, redirect
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
 from django.forms import modelformset_factory
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 
-from .models import Category, Phase, Topic, Project, TopicProgress, ProjectProgress
-from .forms import TopicProgressForm
+from .models import TopicProgress, ProjectProgress, PhaseProgressSummary
+from .cache import aget_tree, get_catalog_version, get_tree, page_cache, page_cache_key
+from .forms import TopicProgressForm, TopicLookup, BaseTopicProgressFormSet
+from .analytics import cohort_report
+from .api import iter_tree_json, parse_fields, parse_include
+from .search import search
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render_metrics, stage
+from .progress import (
+    completed_ids, parse_changes, parse_sync, parse_toggles, save_progress, save_topic_instances,
+    sync_progress, toggle_project, toggle_projects,
+)
 
-def roadmap_view(request):
-    """Display the complete roadmap with progress"""
-    categories = Category.objects.prefetch_related(
-        'phases__topics',
-        'phases__projects'
-    ).all()
+def _topic_formset(request, categories, existing_qs, existing_topic_ids, prefix=None):
+    """Build the TopicProgress formset for the signed-in user
 
-    # Collect all topics to be displayed so we can build a formset
-    topic_qs = Topic.objects.select_related('phase__category').all()
+    ``existing_qs`` must already be evaluated (or be safe to evaluate), so the
+    same code serves both the sync and the async view. The formset covers
+    every topic in ``categories``.
+    """
+    # Every form resolves topic names and ids from this shared lookup
+    topic_lookup = TopicLookup.from_tree(categories)
 
-    # If user is authenticated, prepare a ModelFormSet to show/edit TopicProgress rows
+    # determine missing topics
+    missing_topics = [t for t in topic_lookup.values() if t.id not in existing_topic_ids]
+
+    # create formset class with extra forms for missing topics
+    # (max_num is raised so catalogs over 1000 topics are not truncated)
+    extra = len(missing_topics)
+    TopicProgressFormSet = modelformset_factory(TopicProgress, form=TopicProgressForm,
+                                                formset=BaseTopicProgressFormSet,
+                                                fields=('topic', 'completed'), extra=extra,
+                                                max_num=len(topic_lookup), absolute_max=len(topic_lookup))
+
+    initial = [{'topic': t.id, 'completed': False} for t in missing_topics]
+
+    if request.method == 'POST':
+        return TopicProgressFormSet(request.POST, queryset=existing_qs, initial=initial,
+                                    topic_lookup=topic_lookup, prefix=prefix)
+    return TopicProgressFormSet(queryset=existing_qs, initial=initial, topic_lookup=topic_lookup,
+                                prefix=prefix)
+
+
+def _topic_forms_map(formset):
+    """Map topic_id -> form for simple rendering by topic"""
+    # (iterating the formset is what instantiates its forms)
     topic_forms_map = {}
-    topic_formset = None
-    if request.user.is_authenticated:
-        # get existing progress for displayed topics
-        existing_qs = TopicProgress.objects.filter(user=request.user, topic__in=topic_qs)
-
-        # determine missing topics
-        existing_topic_ids = set(existing_qs.values_list('topic_id', flat=True))
-        missing_topics = [t for t in topic_qs if t.id not in existing_topic_ids]
-
-        # create formset class with extra forms for missing topics
-        extra = len(missing_topics)
-        TopicProgressFormSet = modelformset_factory(TopicProgress, form=TopicProgressForm,
-                                                    fields=('topic', 'completed'), extra=extra)
-
-        initial = [{'topic': t.id, 'completed': False} for t in missing_topics]
-
-        if request.method == 'POST':
-            formset = TopicProgressFormSet(request.POST, queryset=existing_qs)
-            if formset.is_valid():
-                instances = formset.save(commit=False)
-                # save or update instances, ensure user is set
-                for inst in instances:
-                    if not inst.pk:
-                        inst.user = request.user
-                    inst.save()
-                # there may be deletes/other instances; ensure all saved
-                return redirect('roadmap:roadmap')
-        else:
-            formset = TopicProgressFormSet(queryset=existing_qs, initial=initial)
-
-        # Build mapping topic_id -> form for simple rendering by topic
-        for form in formset:
+    with stage('formset'):
+        for form in formset or []:
             topic_id = None
             if form.instance and getattr(form.instance, 'topic_id', None):
                 topic_id = form.instance.topic_id
@@ -57,35 +71,264 @@ def roadmap_view(request):
                 topic_id = form.initial.get('topic')
             if topic_id:
                 topic_forms_map[int(topic_id)] = form
+    return topic_forms_map
 
-        topic_formset = formset
 
-        # Progress lists for quick checks (used for projects display)
-        project_progress = ProjectProgress.objects.filter(
-            user=request.user
-        ).values_list('project_id', flat=True)
-    else:
-        topic_formset = None
-        topic_forms_map = {}
-        project_progress = []
+def _phase_entry(phase, topic_forms_map, summaries):
+    return {
+        'phase': phase,
+        'topics': [{'topic': topic, 'form': topic_forms_map.get(topic.id)} for topic in phase.topics],
+        'projects': phase.projects,
+        'summary': (summaries or {}).get(phase.id),
+    }
+
+
+def _render_roadmap(request, categories, formset, project_progress, page_key, summaries=None):
+    topic_forms_map = _topic_forms_map(formset)
 
     # Build a nested structure so templates can iterate and show forms next to each topic
-    categories_with_forms = []
-    for category in categories:
-        cat_entry = {'category': category, 'phases': []}
-        for phase in category.phases.all():
-            phase_entry = {'phase': phase, 'topics': [], 'projects': phase.projects.all()}
-            for topic in phase.topics.all():
-                phase_entry['topics'].append({'topic': topic, 'form': topic_forms_map.get(topic.id)})
-            cat_entry['phases'].append(phase_entry)
-        categories_with_forms.append(cat_entry)
+    categories_with_forms = [
+        {
+            'category': category,
+            'phases': [_phase_entry(phase, topic_forms_map, summaries) for phase in category.phases],
+        }
+        for category in categories
+    ]
 
     context = {
+        'categories': categories,
         'categories_with_forms': categories_with_forms,
-        'topic_formset': topic_formset,
+        'topic_formset': formset,
+        'project_progress': project_progress,
+    }
+    with stage('template'):
+        response = render(request, 'roadmap/roadmap.html', context)
+    if page_key is not None:
+        page_cache.set(request.user.pk, page_key, response.content)
+    return response
+
+
+def _render_phase_index(request, categories, summaries, page_key):
+    """Signed-in page with category and phase headers only; phases load on demand"""
+    phase_index = [
+        {
+            'category': category,
+            'phases': [{'phase': phase, 'summary': summaries.get(phase.id)} for phase in category.phases],
+        }
+        for category in categories
+    ]
+    # The page has no form of its own; set the CSRF cookie the phase forms will use
+    get_token(request)
+    with stage('template'):
+        response = render(request, 'roadmap/roadmap.html', {
+            'categories': categories,
+            'phase_index': phase_index,
+        })
+    if page_key is not None:
+        page_cache.set(request.user.pk, page_key, response.content)
+    return response
+
+
+def _wants_phase_index(request):
+    # ?all=1 renders every phase's forms in one page (also the no-JS fallback)
+    return request.method == 'GET' and not request.GET.get('all')
+
+
+def _cached_page(request, variant=None):
+    """Return ``(response, page_key)``; response is set on a page cache hit"""
+    if request.method != 'GET':
+        return None, None
+    page_key = page_cache_key(request)
+    if page_key is not None:
+        page_key = (*page_key, variant)
+        content = page_cache.get(request.user.pk, page_key)
+        if content is not None:
+            get_token(request)
+            return HttpResponse(content), page_key
+    return None, page_key
+
+
+def _validators(request):
+    """``(etag, last_modified, public)`` for the roadmap page, from cached versions only
+
+    Anonymous users share one public validator per catalog version. Signed-in
+    validators also cover the user's progress version and CSRF secret (the
+    page embeds a token); they are None until the CSRF cookie is set.
+    """
+    if not request.user.is_authenticated:
+        version = get_catalog_version()
+        return f'"{version:x}"', version, True
+    page_key = page_cache_key(request)
+    if page_key is None:
+        return None, None, False
+    variant = 'index' if _wants_phase_index(request) else 'all'
+    digest = hashlib.sha256(repr((*page_key, variant)).encode()).hexdigest()[:32]
+    # Versions are change timestamps in nanoseconds
+    return f'"{digest}"', max(page_key[0], page_key[1]), False
+
+
+def _not_modified(request, validators):
+    etag, last_modified, public = validators
+    if etag is None:
+        return None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified // 10 ** 9)
+    return response and _with_validators(response, validators)
+
+
+def _with_validators(response, validators):
+    etag, last_modified, public = validators
+    if etag is not None and response.status_code in (200, 304):
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(last_modified // 10 ** 9)
+        # Browsers must revalidate, which the checks above make cheap
+        patch_cache_control(response, no_cache=True, **({'public': True} if public else {'private': True}))
+    return response
+
+
+def conditional_page(view):
+    """Answer If-None-Match / If-Modified-Since with a 304 before ``view`` runs"""
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await view(request, *args, **kwargs)
+            validators = await sync_to_async(_validators)(request)
+            not_modified = _not_modified(request, validators)
+            if not_modified is not None:
+                return not_modified
+            return _with_validators(await view(request, *args, **kwargs), validators)
+    else:
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            validators = _validators(request)
+            not_modified = _not_modified(request, validators)
+            if not_modified is not None:
+                return not_modified
+            return _with_validators(view(request, *args, **kwargs), validators)
+    return wrapper
+
+
+@conditional_page
+def roadmap_view(request):
+    """Display the complete roadmap with progress"""
+    # Immutable catalog snapshot; served from cache while the catalog is unchanged
+    categories = get_tree()
+
+    if not request.user.is_authenticated:
+        return _render_roadmap(request, categories, None, [], None)
+
+    # Signed-in users get their last rendered page back while nothing changed
+    index_only = _wants_phase_index(request)
+    cached, page_key = _cached_page(request, 'index' if index_only else 'all')
+    if cached is not None:
+        return cached
+
+    if index_only:
+        summaries = {s.phase_id: s for s in PhaseProgressSummary.objects.filter(user=request.user)}
+        return _render_phase_index(request, categories, summaries, page_key)
+
+    # get existing progress for displayed topics
+    existing_qs = TopicProgress.objects.filter(user=request.user).order_by('pk')
+    existing_topic_ids = {progress.topic_id for progress in existing_qs}
+
+    # If user is authenticated, prepare a ModelFormSet to show/edit TopicProgress rows
+    formset = _topic_formset(request, categories, existing_qs, existing_topic_ids)
+    if request.method == 'POST' and formset.is_valid():
+        # save or update instances (setting the user) and their phase summaries
+        save_topic_instances(request.user, formset.save(commit=False))
+        return redirect('roadmap:roadmap')
+
+    # Progress lists for quick checks (used for projects display)
+    project_progress = set(ProjectProgress.objects.filter(
+        user=request.user
+    ).values_list('project_id', flat=True))
+    summaries = {s.phase_id: s for s in PhaseProgressSummary.objects.filter(user=request.user)}
+    return _render_roadmap(request, categories, formset, project_progress, page_key, summaries)
+
+
+async def _aget_user(request):
+    # Evaluate the lazy request.user in a worker thread; it may hit the session store
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+
+@conditional_page
+async def aroadmap_view(request):
+    """Async roadmap_view for ASGI deployments"""
+    categories = await aget_tree()
+
+    user = await _aget_user(request)
+    if not user.is_authenticated:
+        return _render_roadmap(request, categories, None, [], None)
+
+    index_only = _wants_phase_index(request)
+    cached, page_key = await sync_to_async(_cached_page)(request, 'index' if index_only else 'all')
+    if cached is not None:
+        return cached
+
+    if index_only:
+        summaries = {s.phase_id: s async for s in PhaseProgressSummary.objects.filter(user=user)}
+        return _render_phase_index(request, categories, summaries, page_key)
+
+    # Iterating the queryset fills its result cache, so the formset reuses these rows
+    existing_qs = TopicProgress.objects.filter(user=user).order_by('pk')
+    existing_topic_ids = {progress.topic_id async for progress in existing_qs}
+
+    formset = _topic_formset(request, categories, existing_qs, existing_topic_ids)
+    if request.method == 'POST' and formset.is_valid():
+        # The async ORM has no transactions; the save runs in one worker thread
+        await sync_to_async(save_topic_instances)(user, formset.save(commit=False))
+        return redirect('roadmap:roadmap')
+
+    project_progress = {
+        project_id async for project_id in
+        ProjectProgress.objects.filter(user=user).values_list('project_id', flat=True)
+    }
+    summaries = {s.phase_id: s async for s in PhaseProgressSummary.objects.filter(user=user)}
+    return _render_roadmap(request, categories, formset, project_progress, page_key, summaries)
+
+
+def _find_phase(categories, phase_id):
+    """Return the catalog tree holding just phase ``phase_id`` and its phase node"""
+    for category in categories:
+        for phase in category.phases:
+            if phase.id == phase_id:
+                return [category._replace(phases=(phase,))], phase
+    raise Http404('No such phase')
+
+
+@login_required
+def phase_view(request, phase_id):
+    """Topics and progress controls of one phase, loaded when it is opened
+
+    GET returns an HTML fragment with a formset for just this phase; a POST
+    of that formset saves only this phase's topics.
+    """
+    tree, phase = _find_phase(get_tree(), phase_id)
+
+    existing_qs = TopicProgress.objects.filter(user=request.user, topic__phase_id=phase_id).order_by('pk')
+    existing_topic_ids = {progress.topic_id for progress in existing_qs}
+    formset = _topic_formset(request, tree, existing_qs, existing_topic_ids, prefix=f'phase-{phase_id}')
+    if request.method == 'POST':
+        if formset.is_valid():
+            save_topic_instances(request.user, formset.save(commit=False))
+            return redirect('roadmap:roadmap')
+        status = 400
+    else:
+        status = 200
+
+    project_progress = set(ProjectProgress.objects.filter(
+        user=request.user, project__phase_id=phase_id
+    ).values_list('project_id', flat=True))
+    context = {
+        'phase_entry': _phase_entry(phase, _topic_forms_map(formset), None),
+        'topic_formset': formset,
         'project_progress': project_progress,
     }
-    return render(request, 'roadmap/roadmap.html', context)
+    with stage('template'):
+        return render(request, 'roadmap/phase.html', context, status=status)
 
 
 @login_required
@@ -94,16 +337,166 @@ def toggle_project_progress(request):
     if request.method == 'POST':
         project_id = request.POST.get('project_id')
         github_link = request.POST.get('github_link', '')
-        progress, created = ProjectProgress.objects.get_or_create(
-            user=request.user,
-            project_id=project_id
-        )
-        if not created:
-            progress.completed = not progress.completed
-        progress.github_link = github_link
-        progress.save()
+        try:
+            completed = toggle_project(request.user, project_id, github_link)
+        except (ValueError, TypeError) as exc:
+            return JsonResponse({'status': 'error', 'message': str(exc)}, status=400)
+        return JsonResponse({
+            'status': 'success',
+            'completed': completed
+        })
+    return JsonResponse({'status': 'error'}, status=400)
+
+
+async def atoggle_project_progress(request):
+    """Async toggle_project_progress for ASGI deployments"""
+    # login_required only wraps sync views on this Django version
+    user = await _aget_user(request)
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    if request.method == 'POST':
+        project_id = request.POST.get('project_id')
+        github_link = request.POST.get('github_link', '')
+        try:
+            completed = await sync_to_async(toggle_project)(user, project_id, github_link)
+        except (ValueError, TypeError) as exc:
+            return JsonResponse({'status': 'error', 'message': str(exc)}, status=400)
         return JsonResponse({
             'status': 'success',
-            'completed': progress.completed
+            'completed': completed
         })
-    return JsonResponse({'status': 'error'}, status=400)
\ No newline at end of file
+    return JsonResponse({'status': 'error'}, status=400)
+
+
+@login_required
+def toggle_projects_view(request):
+    """AJAX view that applies many project toggles and link updates at once
+
+    Expects a JSON body like
+    ``{"projects": [{"id": 1}, {"id": 2, "toggle": false, "github_link": "https://..."}]}``
+    and answers with the new completed state of every project. Either all
+    changes are saved or none.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error'}, status=400)
+    try:
+        payload = json.loads(request.body or b'{}')
+        results = toggle_projects(request.user, parse_toggles(payload.get('projects')))
+    except (ValueError, TypeError, AttributeError) as exc:
+        return JsonResponse({'status': 'error', 'message': str(exc)}, status=400)
+    return JsonResponse({
+        'status': 'success',
+        'projects': [{'id': pk, 'completed': completed} for pk, completed in results.items()],
+    })
+
+
+@login_required
+def save_progress_view(request):
+    """AJAX view that saves only the changed topics and projects
+
+    Expects a JSON body like
+    ``{"topics": [{"id": 1, "completed": true}], "projects": [...]}``.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error'}, status=400)
+    try:
+        payload = json.loads(request.body or b'{}')
+        topic_changes = parse_changes(payload.get('topics'))
+        project_changes = parse_changes(payload.get('projects'))
+        save_progress(request.user, topic_changes, project_changes)
+    except (ValueError, TypeError, AttributeError) as exc:
+        return JsonResponse({'status': 'error', 'message': str(exc)}, status=400)
+    return JsonResponse({
+        'status': 'success',
+        'topics': len(topic_changes),
+        'projects': len(project_changes),
+    })
+
+
+@login_required
+def sync_progress_view(request):
+    """AJAX view that merges a browser's offline checklist into the user's progress
+
+    Takes the checked.json payload of the static site plus client
+    timestamps (see progress.parse_sync), merges it last-writer-wins and
+    answers with the merged checklist in the same shape, so the browser can
+    replace its local copy.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error'}, status=400)
+    try:
+        topic_changes, project_changes = parse_sync(json.loads(request.body or b'{}'))
+    except (ValueError, TypeError) as exc:
+        return JsonResponse({'status': 'error', 'message': str(exc)}, status=400)
+    topics, projects, skipped = sync_progress(request.user, topic_changes, project_changes)
+    return JsonResponse({
+        'status': 'success',
+        'topics': topics,
+        'projects': projects,
+        'skipped': skipped,
+        'checked': completed_ids(request.user),
+    })
+
+
+def search_view(request):
+    """JSON search over topics, projects, phases and resources
+
+    ``?q=`` is the query, ``?kind=`` optionally restricts the results to
+    one kind and ``?limit=`` caps their number (20 by default).
+    """
+    try:
+        results = search(request.GET.get('q', ''), request.GET.get('limit', 20),
+                         request.GET.get('kind') or None)
+    except ValueError as exc:
+        return JsonResponse({'status': 'error', 'message': str(exc)}, status=400)
+    return JsonResponse({'status': 'success', 'results': results})
+
+
+def api_tree_view(request):
+    """Read-only JSON export of the catalog, streamed one category at a time
+
+    ``?category=AI`` (repeatable) limits the categories,
+    ``?include=phases,topics`` the child collections and
+    ``?fields[topic]=id,name`` the fields of each type. ``?progress=1``
+    adds the signed-in user's ``completed`` flag to topics and projects.
+    """
+    with_progress = request.GET.get('progress') == '1'
+    if with_progress and not request.user.is_authenticated:
+        return JsonResponse({'status': 'error', 'message': 'sign in to embed progress'}, status=403)
+    try:
+        fields = parse_fields(request.GET, progress=with_progress)
+        include = parse_include(request.GET.get('include'))
+    except ValueError as exc:
+        return JsonResponse({'status': 'error', 'message': str(exc)}, status=400)
+
+    categories = get_tree()
+    codes = request.GET.getlist('category')
+    if codes:
+        categories = [category for category in categories if category.code in codes]
+    progress = None
+    if with_progress:
+        done = completed_ids(request.user)
+        progress = {'topic': set(done['topics']), 'project': set(done['projects'])}
+    return StreamingHttpResponse(iter_tree_json(categories, fields, include, progress),
+                                 content_type='application/json')
+
+
+@staff_member_required
+def analytics_view(request):
+    """Cohort analytics across all users' progress (staff only)"""
+    report = cohort_report()
+    if request.GET.get('format') == 'json':
+        return JsonResponse(report)
+    return render(request, 'roadmap/analytics.html', {'report': report})
+
+
+def metrics_view(request):
+    """Request metrics of this process in the Prometheus text format
+
+    Served to staff users and to the scraper addresses listed in
+    ROADMAP_METRICS_ALLOWED_IPS; everyone else gets a 403.
+    """
+    allowed = request.META.get('REMOTE_ADDR') in settings.ROADMAP_METRICS_ALLOWED_IPS
+    if not (allowed or request.user.is_active and request.user.is_staff):
+        raise PermissionDenied
+    return HttpResponse(render_metrics(), content_type=METRICS_CONTENT_TYPE)
@@ -12,9 +12,13 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 
+import environ
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+env = environ.Env()
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
@@ -41,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "apps.roadmap.metrics.MetricsMiddleware",
+    "apps.roadmap.querycheck.QueryCheckMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -75,11 +81,54 @@ WSGI_APPLICATION = "personal_website.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# DATABASE_URL picks the primary (a SQLite file next to manage.py by default).
+# DATABASE_REPLICA_URL optionally adds a read replica that serves catalog
+# reads (see apps/roadmap/routers.py). To try it locally with two files:
+#   DATABASE_URL=sqlite:////tmp/primary.sqlite3 DATABASE_REPLICA_URL=sqlite:////tmp/replica.sqlite3
+# migrate both aliases and copy the primary file over the replica after
+# catalog changes.
+
+def database_config(var, default=None):
+    # An empty variable counts as unset
+    config = env.db_url_config(env.str(var, default="") or default)
+    # Keep connections open between requests and check them before reuse
+    config["CONN_MAX_AGE"] = env.int("DATABASE_CONN_MAX_AGE", default=60)
+    config["CONN_HEALTH_CHECKS"] = True
+    if config["ENGINE"] == "django.db.backends.sqlite3":
+        # Seconds a connection waits for a lock before "database is locked"
+        config.setdefault("OPTIONS", {})["timeout"] = env.int("SQLITE_BUSY_TIMEOUT", default=20)
+    return config
+
+
 DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
+    "default": database_config("DATABASE_URL", default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}"),
+}
+if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    # A file rather than shared-cache memory, so tests can use several connections at once
+    DATABASES["default"]["TEST"] = {"NAME": BASE_DIR / "test_db.sqlite3"}
+
+ROADMAP_REPLICA_DATABASE = None
+if env.str("DATABASE_REPLICA_URL", default=""):
+    DATABASES["replica"] = database_config("DATABASE_REPLICA_URL")
+    # Tests run against one database; the replica alias points at it
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+    ROADMAP_REPLICA_DATABASE = "replica"
+
+DATABASE_ROUTERS = ["apps.roadmap.routers.CatalogReplicaRouter"]
+
+# Write-ahead logging for SQLite files (see apps/roadmap/signals.py)
+ROADMAP_SQLITE_WAL = env.bool("SQLITE_WAL", default=True)
+
+
+# Cache
+# The catalog and per-user progress versions in apps/roadmap/cache.py live in
+# this cache and must be seen by every worker process, so a per-process
+# LocMemCache only works with a single process (check roadmap.W001 warns).
+# CACHE_URL picks the backend, e.g. redis://127.0.0.1:6379/1; the default
+# is a file cache next to manage.py, shared by all processes on this host.
+
+CACHES = {
+    "default": env.cache("CACHE_URL", default=f"filecache://{BASE_DIR / '.cache'}"),
 }
 
 
@@ -123,3 +172,23 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# Roadmap caching
+# Upper bound for the in-process cache of rendered signed-in roadmap pages
+
+ROADMAP_PAGE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Serve the async roadmap views (set ROADMAP_ASYNC_VIEWS=1 when running under ASGI)
+ROADMAP_ASYNC_VIEWS = env.bool('ROADMAP_ASYNC_VIEWS', default=False)
+
+# Share of requests whose latency, SQL and stage timings are recorded (served at /metrics)
+ROADMAP_METRICS_SAMPLE_RATE = env.float('ROADMAP_METRICS_SAMPLE_RATE', default=1.0)
+# /metrics is served to staff users and to these addresses (e.g. the Prometheus scraper)
+ROADMAP_METRICS_ALLOWED_IPS = env.list('ROADMAP_METRICS_ALLOWED_IPS', default=[])
+
+# Report query shapes repeated ROADMAP_QUERYCHECK_THRESHOLD+ times in one request
+# ('log' or 'raise'); off unless set in the environment, as it records a stack
+# trace per query
+ROADMAP_QUERYCHECK = env.str('ROADMAP_QUERYCHECK', default='')
+ROADMAP_QUERYCHECK_THRESHOLD = 5
@@ -17,8 +17,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 
+from apps.roadmap.views import metrics_view
+
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("roadmap/", include("apps.roadmap.urls")),
+    path("metrics", metrics_view, name="metrics"),
 ]
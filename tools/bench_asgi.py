@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+"""
+Compare concurrent request throughput of the roadmap under ASGI and WSGI.
+
+Each mode runs in its own process so the URLconf picks the matching views:
+the ASGI run sets ROADMAP_ASYNC_VIEWS=1 and drives personal_website.asgi
+with concurrent coroutines; the WSGI run drives personal_website.wsgi from a
+thread pool, the way a threaded WSGI server would.
+
+    python tools/bench_asgi.py --requests 500 --concurrency 32 [--username NAME]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+HOST = 'localhost'
+
+
+def session_cookie(username):
+    """Create a logged-in session for ``username`` and return the cookie header"""
+    if not username:
+        return ''
+    from django.conf import settings
+    from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+    from django.contrib.auth.models import User
+    from django.contrib.sessions.backends.db import SessionStore
+
+    user = User.objects.get(username=username)
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+
+def run_asgi(path, total, concurrency, cookie):
+    from personal_website.asgi import application
+
+    headers = [(b'host', HOST.encode())]
+    if cookie:
+        headers.append((b'cookie', cookie.encode()))
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': b'', 'root_path': '', 'headers': headers,
+        'client': ('127.0.0.1', 0), 'server': (HOST, 80),
+    }
+
+    async def one():
+        status = None
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+
+        await application(dict(scope), receive, send)
+        return status
+
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited():
+            async with semaphore:
+                return await one()
+
+        return await asyncio.gather(*(limited() for _ in range(total)))
+
+    return asyncio.run(main())
+
+
+def run_wsgi(path, total, concurrency, cookie):
+    from personal_website.wsgi import application
+
+    def one(_):
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '',
+            'SERVER_NAME': HOST, 'SERVER_PORT': '80', 'HTTP_HOST': HOST,
+            'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.url_scheme': 'http',
+            'wsgi.input': BytesIO(), 'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+        }
+        if cookie:
+            environ['HTTP_COOKIE'] = cookie
+        statuses = []
+        body = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        for _ in body:
+            pass
+        body.close()
+        return int(statuses[0].split()[0])
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(one, range(total)))
+
+
+def child(args):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'personal_website.settings')
+    import django
+    django.setup()
+
+    cookie = session_cookie(args.username)
+    runner = run_asgi if args.mode == 'asgi' else run_wsgi
+    # warm up the catalog cache and template loaders
+    runner(args.path, min(args.concurrency, args.requests), args.concurrency, cookie)
+    started = time.perf_counter()
+    statuses = runner(args.path, args.requests, args.concurrency, cookie)
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        'mode': args.mode,
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'seconds': round(elapsed, 4),
+        'requests_per_second': round(args.requests / elapsed, 1),
+        'errors': sum(1 for status in statuses if status != 200),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--path', default='/roadmap/')
+    parser.add_argument('--username', help='benchmark as this signed-in user')
+    parser.add_argument('--mode', choices=['asgi', 'wsgi'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        child(args)
+        return
+
+    results = []
+    for mode in ('wsgi', 'asgi'):
+        env = dict(os.environ, ROADMAP_ASYNC_VIEWS='1' if mode == 'asgi' else '0')
+        command = [sys.executable, __file__, '--mode', mode, '--requests', str(args.requests),
+                   '--concurrency', str(args.concurrency), '--path', args.path]
+        if args.username:
+            command += ['--username', args.username]
+        output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    for result in results:
+        print(f"{result['mode'].upper()}: {result['requests_per_second']} req/s "
+              f"({result['requests']} requests, concurrency {result['concurrency']}, "
+              f"{result['errors']} errors)")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+"""
+Benchmark the roadmap views and the static build on synthetic catalogs.
+
+Every scale runs against a fresh test database filled by
+apps.roadmap.synthetic.generate_catalog, so the real database is never
+touched. Results are JSON and two result files can be compared:
+
+    python tools/bench_roadmap.py --scales small,medium --output bench.json
+    python tools/bench_roadmap.py --compare before.json after.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'tools'))
+
+# Per-category phases, per-phase topics and projects
+SCALES = {
+    'small': {'categories': 1, 'phases': 4, 'topics': 10, 'projects': 2, 'users': 20},
+    'medium': {'categories': 2, 'phases': 8, 'topics': 25, 'projects': 3, 'users': 200},
+    'large': {'categories': 4, 'phases': 10, 'topics': 50, 'projects': 4, 'users': 500},
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root,
+                              check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(fn, repeat):
+    """Time ``fn`` ``repeat`` times after one warm-up call"""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    fn()
+    timings, queries = [], []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as ctx:
+            started = perf_counter()
+            fn()
+            timings.append(perf_counter() - started)
+        queries.append(len(ctx.captured_queries))
+    timings.sort()
+    ms = [t * 1000 for t in timings]
+    return {
+        'repeat': repeat,
+        'mean_ms': round(sum(ms) / len(ms), 3),
+        'median_ms': round(ms[len(ms) // 2], 3),
+        'p95_ms': round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+        'min_ms': round(ms[0], 3),
+        'queries': max(queries),
+    }
+
+
+def expect(response, *statuses):
+    if response.status_code not in statuses:
+        raise RuntimeError(f'unexpected status {response.status_code} for {response.request["PATH_INFO"]}')
+    return response
+
+
+def formset_data(formset):
+    """POST data reproducing ``formset`` as rendered"""
+    data = {
+        formset.management_form.add_prefix(name): value
+        for name, value in formset.management_form.initial.items()
+    }
+    for form in formset:
+        data[form.add_prefix('topic')] = form['topic'].value()
+        if form.instance.pk:
+            data[form.add_prefix('id')] = form.instance.pk
+        if form['completed'].value():
+            data[form.add_prefix('completed')] = 'on'
+    return data
+
+
+def view_benchmarks(user, repeat):
+    from django.test import Client
+    from django.urls import reverse
+    from apps.roadmap.cache import page_cache
+    from apps.roadmap.models import Project, TopicProgress
+
+    url = reverse('roadmap:roadmap')
+    full_url = f'{url}?all=1'
+    anonymous = Client()
+    client = Client()
+    client.force_login(user)
+
+    def uncached_get(path):
+        page_cache.clear()
+        return expect(client.get(path), 200)
+
+    # Flip one existing progress row per POST so every request writes
+    page_cache.clear()
+    formset = expect(client.get(full_url), 200).context['topic_formset']
+    states = [formset_data(formset)]
+    existing = next(form for form in formset if form.instance.pk)
+    flipped = dict(states[0])
+    key = existing.add_prefix('completed')
+    if key in flipped:
+        del flipped[key]
+    else:
+        flipped[key] = 'on'
+    states.append(flipped)
+    posts = iter(range(10 ** 9))
+
+    def post():
+        return expect(client.post(full_url, states[next(posts) % 2]), 302)
+
+    project = Project.objects.values_list('pk', 'phase_id').first()
+    project_id, phase_url = project[0], reverse('roadmap:phase', args=[project[1]])
+    topic_id = TopicProgress.objects.filter(user=user).values_list('topic_id', flat=True).first()
+    saves = iter(range(10 ** 9))
+
+    def save_progress():
+        body = json.dumps({'topics': [{'id': topic_id, 'completed': next(saves) % 2 == 0}]})
+        return expect(client.post(reverse('roadmap:save_progress'), body,
+                                  content_type='application/json'), 200)
+
+    return {
+        'anonymous_get': measure(lambda: expect(anonymous.get(url), 200), repeat),
+        'signed_in_get_index': measure(lambda: uncached_get(url), repeat),
+        'signed_in_get_phase': measure(lambda: expect(client.get(phase_url), 200), repeat),
+        'signed_in_get': measure(lambda: uncached_get(full_url), repeat),
+        'signed_in_get_cached': measure(lambda: expect(client.get(full_url), 200), repeat),
+        'signed_in_post': measure(post, repeat),
+        'toggle_project': measure(
+            lambda: expect(client.post(reverse('roadmap:toggle_project'), {'project_id': project_id}), 200),
+            repeat),
+        'save_progress': measure(save_progress, repeat),
+        'search': measure(
+            lambda: expect(anonymous.get(reverse('roadmap:search'), {'q': 'build phase'}), 200), repeat),
+    }
+
+
+def static_build_benchmarks(repeat):
+    import build_static
+
+    results = {}
+    for name, options in (('build_static', {}), ('build_static_optimized', {'optimize': True})):
+        with tempfile.TemporaryDirectory() as output_dir:
+            def build():
+                # Keep the build's own progress output out of the report
+                with contextlib.redirect_stdout(io.StringIO()):
+                    build_static.build_static_site(output_dir=output_dir, **options)
+            results[name] = measure(build, repeat)
+    return results
+
+
+def run_scale(size, repeat, build_repeat):
+    from django.db import connection
+    from apps.roadmap.cache import bump_catalog_version, page_cache
+    from apps.roadmap.synthetic import generate_catalog
+    from django.contrib.auth.models import User
+
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        # Cache keys follow the database, so the site's entries are untouched;
+        # a fresh version keeps trees from earlier runs out
+        bump_catalog_version()
+        page_cache.clear()
+        started = perf_counter()
+        counts = generate_catalog(**size)
+        generate_seconds = perf_counter() - started
+        user = User.objects.filter(username__endswith='-user-1').get()
+        benchmarks = view_benchmarks(user, repeat)
+        benchmarks.update(static_build_benchmarks(build_repeat))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+    return {'size': counts, 'generate_seconds': round(generate_seconds, 3), 'benchmarks': benchmarks}
+
+
+def run(scales, repeat, build_repeat):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'personal_website.settings')
+    import django
+    from django.conf import settings
+    from django.test.utils import setup_test_environment
+
+    django.setup()
+    setup_test_environment()
+    # Large formsets post more fields than the default limit allows
+    settings.DATA_UPLOAD_MAX_NUMBER_FIELDS = None
+
+    results = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'scales': {},
+    }
+    for name in scales:
+        print(f'Running {name} ...', file=sys.stderr)
+        results['scales'][name] = run_scale(SCALES[name], repeat, build_repeat)
+    return results
+
+
+def compare(before, after):
+    """Print median timings of two result files side by side"""
+    print(f"{'scale':8} {'benchmark':24} {'before ms':>10} {'after ms':>10} {'change':>8} {'queries':>9}")
+    for scale, data in after['scales'].items():
+        old = before['scales'].get(scale, {}).get('benchmarks', {})
+        for name, result in data['benchmarks'].items():
+            if name not in old:
+                continue
+            was, now = old[name]['median_ms'], result['median_ms']
+            change = f'{(now - was) / was:+.0%}' if was else '-'
+            queries = f"{old[name]['queries']}->{result['queries']}"
+            print(f'{scale:8} {name:24} {was:>10.2f} {now:>10.2f} {change:>8} {queries:>9}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', default='small,medium',
+                        help=f"comma-separated scales out of {', '.join(SCALES)} (default: small,medium)")
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs per view benchmark')
+    parser.add_argument('--build-repeat', type=int, default=3, help='timed runs per static build')
+    parser.add_argument('--output', help='write the JSON results here instead of stdout')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help='compare two result files instead of running')
+    args = parser.parse_args()
+
+    if args.compare:
+        before, after = (json.loads(Path(path).read_text(encoding='utf-8')) for path in args.compare)
+        compare(before, after)
+        return
+
+    scales = [name.strip() for name in args.scales.split(',') if name.strip()]
+    unknown = [name for name in scales if name not in SCALES]
+    if unknown:
+        parser.error(f"unknown scale(s): {', '.join(unknown)}")
+    output = json.dumps(run(scales, args.repeat, args.build_repeat), indent=2)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,9 +2,11 @@
 """
 Build static files for GitHub Pages deployment.
 """
+import argparse
+import hashlib
 import os
 import sys
-import shutil
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 # Add project root to Python path
@@ -17,21 +19,69 @@ import django
 django.setup()
 
 from django.template.loader import render_to_string
-from apps.roadmap.models import Category
+from apps.roadmap.cache import build_tree
+from minify import compressed_variants, minify_css, optimize_pages
 import json
 
-def build_static_site():
-    """Build static files for GitHub Pages."""
-    # Get all categories with related data
-    categories = Category.objects.prefetch_related(
-        'phases__topics', 
-        'phases__projects'
-    ).all()
-    
-    # Optionally read a local checked.json exported from browser localStorage
+MANIFEST_PATH = project_root / 'tools' / '.build_manifest.json'
+
+
+def sha256(data):
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path):
+    return sha256(path.read_bytes()) if path.exists() else None
+
+
+def write_if_changed(path, data):
+    """Write ``data`` to ``path`` only if the bytes differ, keeping mtimes stable"""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    if path.exists() and path.read_bytes() == data:
+        return False
+    path.write_bytes(data)
+    return True
+
+
+def input_hashes(categories, checked_file, css_source):
+    """Hash every input that affects the rendered output"""
+    templates_dir = project_root / 'templates'
+    hashes = {
+        'catalog': sha256(json.dumps(categories, sort_keys=True)),
+        'checked.json': file_hash(checked_file),
+        'web.css': file_hash(css_source),
+        'build_static.py': file_hash(Path(__file__).resolve()),
+        # Minification and compression change the output bytes too
+        'minify.py': file_hash(Path(__file__).resolve().with_name('minify.py')),
+    }
+    for template in sorted(templates_dir.rglob('*.html')):
+        hashes[f'templates/{template.relative_to(templates_dir).as_posix()}'] = file_hash(template)
+    return hashes
+
+
+def load_manifest(path=MANIFEST_PATH):
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def is_up_to_date(manifest, inputs, roadmap_path):
+    if manifest.get('inputs') != inputs:
+        return False
+    outputs = manifest.get('outputs', {})
+    return bool(outputs) and all(
+        file_hash(roadmap_path / name) == digest for name, digest in outputs.items()
+    )
+
+
+def read_checked(checked_file):
+    """Optionally read a local checked.json exported from browser localStorage"""
     checked_topics = set()
     checked_projects = set()
-    checked_file = project_root / 'tools' / 'checked.json'
     if checked_file.exists():
         try:
             with open(checked_file, 'r', encoding='utf-8') as fh:
@@ -50,34 +100,244 @@ def build_static_site():
             print(f'Loaded checked items: {len(checked_topics)} topics, {len(checked_projects)} projects')
         except Exception as e:
             print('Failed to read tools/checked.json:', e)
+    return checked_topics, checked_projects
+
+
+def category_dir(category):
+    return category.code.lower()
+
+
+def phase_dir(phase):
+    return f'phase-{phase.order}'
+
+
+def category_shard(category, checked_topics, checked_projects):
+    """Compact JSON for one category, as fetched by the client-rendered page
+
+    Topics and projects are ``[id, name]`` / ``[id, name, description]``
+    arrays keyed by their database ids, the same ids used in data-topic-id,
+    localStorage keys and checked.json.
+    """
+    topic_ids = {t.id for phase in category.phases for t in phase.topics}
+    project_ids = {p.id for phase in category.phases for p in phase.projects}
+    shard = {
+        'id': category.id,
+        'code': category.code,
+        'name': category.name,
+        'phases': [
+            {
+                'id': phase.id,
+                'order': phase.order,
+                'title': phase.title,
+                'week_range': phase.week_range,
+                'goal': phase.goal,
+                'topics': [[t.id, t.name] for t in phase.topics],
+                'projects': [[p.id, p.name, p.description] for p in phase.projects],
+            }
+            for phase in category.phases
+        ],
+        'checked': {
+            'topics': sorted(topic_ids & checked_topics),
+            'projects': sorted(project_ids & checked_projects),
+        },
+    }
+    return json.dumps(shard, separators=(',', ':'), ensure_ascii=False)
+
+
+def category_shards(categories, checked_topics, checked_projects):
+    """Return ``(shards, files)``: template entries and ``data/<code>.<hash>.json`` contents"""
+    shards, files = [], {}
+    for category in categories:
+        data = category_shard(category, checked_topics, checked_projects)
+        # The content hash in the name lets browsers cache shards indefinitely
+        name = f'data/{category_dir(category)}.{sha256(data)[:12]}.json'
+        files[name] = data
+        shards.append({'category': category, 'url': name})
+    return shards, files
+
+
+def page_tasks(categories):
+    """One task per category and per phase; each carries only its slice of the tree"""
+    for category in categories:
+        yield (f'{category_dir(category)}/index.html', 'category', category)
+        for phase in category.phases:
+            # A category node holding just this phase renders through the same template
+            yield (f'{category_dir(category)}/{phase_dir(phase)}/index.html', 'phase',
+                   category._replace(phases=(phase,)))
+
+
+_worker_checked = (set(), set())
 
+
+def init_worker(checked_topics, checked_projects):
+    global _worker_checked
+    _worker_checked = (checked_topics, checked_projects)
+
+
+def render_page(task):
+    """Render one category or phase page; runs in a worker process without the ORM"""
+    name, kind, category = task
     context = {
-        'categories': categories,
-        'static_checked_topics': checked_topics,
-        'static_checked_projects': checked_projects,
+        'categories': (category,),
+        'static_checked_topics': _worker_checked[0],
+        'static_checked_projects': _worker_checked[1],
+        'static_page': {
+            'kind': kind,
+            'root': '../' if kind == 'category' else '../../',
+            'category': category,
+        },
+    }
+    return name, render_to_string('roadmap/roadmap.html', context)
+
+
+def render_pages(categories, checked_topics, checked_projects, jobs):
+    """Render the index page plus one page per category and phase in parallel"""
+    pages = {
+        'index.html': render_to_string('roadmap/static_index.html', {'categories': categories}),
     }
-    
-    # Render roadmap page
-    roadmap_html = render_to_string('roadmap/roadmap.html', context)
-    roadmap_path = project_root / 'roadmap'
-    roadmap_path.mkdir(exist_ok=True)
-    
-    # Write static roadmap file
-    with open(roadmap_path / 'index.html', 'w', encoding='utf-8') as f:
-        f.write(roadmap_html)
+    tasks = list(page_tasks(categories))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                             initargs=(checked_topics, checked_projects)) as pool:
+        pages.update(pool.map(render_page, tasks, chunksize=max(1, len(tasks) // (jobs * 4 or 1))))
+    return pages
+
+
+def print_savings(rendered, outputs_bytes):
+    """Report original, minified and compressed sizes for each output file"""
+    print(f"{'file':40} {'original':>10} {'minified':>10} {'gzip':>10} {'brotli':>10}")
+    for name, data in outputs_bytes.items():
+        if name.endswith(('.gz', '.br')):
+            continue
+        original = len(rendered.get(name, data))
+        gz = outputs_bytes.get(name + '.gz')
+        br = outputs_bytes.get(name + '.br')
+        print(f"{name:40} {original:>10} {len(data):>10} "
+              f"{len(gz) if gz else '-':>10} {len(br) if br else '-':>10}")
+
+
+def build_static_site(incremental=False, split=False, jobs=None, optimize=False,
+                      client_render=False, output_dir=None):
+    """Build static files for GitHub Pages.
+
+    With ``incremental`` the build is skipped when the hashes of the catalog,
+    checked.json, templates and CSS match the manifest from the last build
+    and the outputs on disk are unchanged. With ``split`` one page is
+    written per category and per phase, rendered across ``jobs`` worker
+    processes, plus a lightweight index page. With ``optimize`` the output
+    is minified, inline scripts move to content-hashed files and ``.gz``
+    (and ``.br`` when brotli is installed) copies are written next to each
+    file.
+
+    Every build also writes one compact JSON shard per category under
+    ``data/``. With ``client_render`` the page itself only holds category
+    headers and fetches a shard when its category is expanded.
+
+    ``output_dir`` replaces the default ``roadmap/`` directory; its build
+    manifest is then kept inside it.
+    """
+    # Read the catalog straight from the database: a published site must not
+    # depend on whatever tree another process left in the shared cache
+    categories = build_tree()
+
+    checked_file = project_root / 'tools' / 'checked.json'
+    css_source = project_root / 'web.css'
+    roadmap_path = Path(output_dir) if output_dir else project_root / 'roadmap'
+    manifest_path = roadmap_path / '.build_manifest.json' if output_dir else MANIFEST_PATH
+
+    inputs = input_hashes(categories, checked_file, css_source)
+    inputs['mode'] = 'split' if split else 'single'
+    inputs['optimize'] = optimize
+    inputs['client_render'] = client_render
+    manifest = load_manifest(manifest_path)
+    if incremental and is_up_to_date(manifest, inputs, roadmap_path):
+        print('Static site is up to date; nothing to build.')
+        return False
+
+    checked_topics, checked_projects = read_checked(checked_file)
+    shards, shard_files = category_shards(categories, checked_topics, checked_projects)
+
+    if split:
+        pages = render_pages(categories, checked_topics, checked_projects, jobs or os.cpu_count() or 1)
+    else:
+        context = {
+            'categories': categories,
+            'static_checked_topics': checked_topics,
+            'static_checked_projects': checked_projects,
+            'static_shards': shards if client_render else None,
+        }
+        # Render roadmap page
+        pages = {'index.html': render_to_string('roadmap/roadmap.html', context)}
+    roadmap_path.mkdir(parents=True, exist_ok=True)
+
+    # Collect every output as bytes: pages, CSS and (optionally) assets
+    rendered = {name: html.encode('utf-8') for name, html in pages.items()}
+    rendered.update((name, data.encode('utf-8')) for name, data in shard_files.items())
+    if css_source.exists():
+        rendered['web.css'] = css_source.read_bytes()
+    outputs_bytes = dict(rendered)
+    if optimize:
+        outputs_bytes = {
+            name: html.encode('utf-8') for name, html in optimize_pages(pages).items()
+        }
+        outputs_bytes.update((name, rendered[name]) for name in shard_files)
+        if css_source.exists():
+            outputs_bytes['web.css'] = minify_css(rendered['web.css'].decode('utf-8')).encode('utf-8')
+        for name, data in list(outputs_bytes.items()):
+            for suffix, variant in compressed_variants(data).items():
+                outputs_bytes[name + suffix] = variant
+
+    # Write static roadmap files
+    written = []
+    for name, data in outputs_bytes.items():
+        path = roadmap_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if write_if_changed(path, data):
+            written.append(name)
 
     # Create an empty .nojekyll so GitHub Pages won't run Jekyll (prevents ignoring files)
     nojekyll_path = roadmap_path / '.nojekyll'
     if not nojekyll_path.exists():
         nojekyll_path.write_text('', encoding='utf-8')
-    
-    # Copy CSS file if it exists
-    css_source = project_root / 'web.css'
-    if css_source.exists():
-        shutil.copy(css_source, project_root / 'roadmap' / 'web.css')
-    
+
+    outputs = {name: sha256(data) for name, data in outputs_bytes.items()}
+
+    # Remove pages of categories or phases that no longer exist
+    for name in sorted(set(manifest.get('outputs', {})) - set(outputs)):
+        stale = roadmap_path / name
+        if stale.exists():
+            stale.unlink()
+            written.append(f'{name} (removed)')
+            for parent in stale.parents:
+                if parent == roadmap_path or any(parent.iterdir()):
+                    break
+                parent.rmdir()
+
+    write_if_changed(manifest_path, json.dumps({'inputs': inputs, 'outputs': outputs}, indent=2, sort_keys=True))
+
     print('Static files built successfully:')
-    print(f'- {roadmap_path}/index.html')
+    print(f'- {roadmap_path}/index.html' + (f' and {len(pages) - 1} category/phase pages' if split else ''))
+    print(f"Files changed: {', '.join(written) if written else 'none'}")
+    if optimize:
+        print_savings(rendered, outputs_bytes)
+    return True
+
 
 if __name__ == '__main__':
-    build_static_site()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Build the static roadmap for GitHub Pages.')
+    parser.add_argument('--incremental', action='store_true',
+                        help='skip the build when no input changed since the last build')
+    parser.add_argument('--split', action='store_true',
+                        help='write one page per category and per phase plus an index page')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='worker processes for --split (default: number of CPUs)')
+    parser.add_argument('--optimize', action='store_true',
+                        help='minify output, extract inline scripts and write .gz/.br copies')
+    parser.add_argument('--client-render', action='store_true',
+                        help='render category headers only and load each category from its JSON shard')
+    parser.add_argument('--output', default=None,
+                        help='output directory (default: roadmap/ in the project root)')
+    args = parser.parse_args()
+    if args.client_render and args.split:
+        parser.error('--client-render and --split are alternative page layouts')
+    build_static_site(incremental=args.incremental, split=args.split, jobs=args.jobs,
+                      optimize=args.optimize, client_render=args.client_render, output_dir=args.output)
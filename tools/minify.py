@@ -0,0 +1,89 @@
+"""
+Post-render optimisation for the static site: minify HTML and CSS, move
+inline scripts into content-hashed files and precompress every output.
+"""
+import gzip
+import hashlib
+import re
+
+try:
+    import brotli
+except ImportError:  # optional; .br files are only written when available
+    brotli = None
+
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_CSS_SPACE = re.compile(r'\s+')
+_CSS_PUNCT = re.compile(r'\s*([{};:,>])\s*')
+
+_RAW_BLOCK = re.compile(r'(<(pre|textarea|script|style)\b[^>]*>)(.*?)(</\2>)', re.S | re.I)
+_INLINE_SCRIPT = re.compile(r'<script>(.*?)</script>', re.S | re.I)
+_HTML_COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.S)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def minify_css(css):
+    css = _CSS_COMMENT.sub('', css)
+    css = _CSS_SPACE.sub(' ', css)
+    css = _CSS_PUNCT.sub(r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+def minify_html(html):
+    """Collapse whitespace outside <pre>, <textarea> and <script>; minify <style>
+
+    Runs of whitespace become a single space rather than being removed, so
+    spacing between inline elements renders exactly as before.
+    """
+    blocks = []
+
+    def stash(match):
+        open_tag, tag, body, close_tag = match.groups()
+        if tag.lower() == 'style':
+            body = minify_css(body)
+        blocks.append(open_tag + body + close_tag)
+        return f'\x00{len(blocks) - 1}\x00'
+
+    html = _RAW_BLOCK.sub(stash, html)
+    html = _HTML_COMMENT.sub('', html)
+    html = _WHITESPACE.sub(' ', html).strip()
+    return re.sub('\x00(\\d+)\x00', lambda m: blocks[int(m.group(1))], html)
+
+
+def extract_scripts(html, prefix):
+    """Move inline <script> bodies into content-hashed files
+
+    Returns the rewritten HTML and a dict of ``file name -> script``.
+    ``prefix`` is the relative path from the page to the site root.
+    """
+    assets = {}
+
+    def replace(match):
+        script = match.group(1).strip()
+        digest = hashlib.sha256(script.encode('utf-8')).hexdigest()[:12]
+        name = f'roadmap.{digest}.js'
+        assets[name] = script
+        return f'<script src="{prefix}{name}"></script>'
+
+    return _INLINE_SCRIPT.sub(replace, html), assets
+
+
+def optimize_pages(pages):
+    """Minify every page and extract its inline scripts into shared files"""
+    optimized = {}
+    for name, html in pages.items():
+        depth = name.count('/')
+        html, assets = extract_scripts(html, '../' * depth)
+        optimized[name] = minify_html(html)
+        optimized.update(assets)
+    return optimized
+
+
+def compressed_variants(data):
+    """Return ``{suffix: bytes}`` of precompressed copies of ``data``"""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    # mtime=0 keeps .gz output byte-identical between builds
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, quality=11)
+    return variants